@@ -0,0 +1,3 @@
+"""
+Benchmarks of ID generation, save throughput and sort latency. Run with `python -m benchmarks`.
+"""
@@ -0,0 +1,89 @@
+"""
+Run benchmarks and optionally compare them with a saved baseline.
+"""
+import argparse
+import sys
+
+from benchmarks import baseline as baselines
+from benchmarks.suite import (
+    CASES,
+    DATABASES,
+    SIZES,
+    run,
+)
+
+
+MULTIPLIERS = {'k': 10 ** 3, 'm': 10 ** 6}
+
+
+def parse_size(value):
+    value = value.strip().lower()
+    if value[-1:] in MULTIPLIERS:
+        return int(value[:-1]) * MULTIPLIERS[value[-1]]
+
+    return int(value)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__)
+    parser.add_argument(
+        '--databases', nargs='+', choices=DATABASES, default=DATABASES,
+        help='SQLite databases to run against',
+    )
+    parser.add_argument(
+        '--sizes', nargs='+', type=parse_size, default=SIZES,
+        help='table sizes, f.e. 1k 10k 1m',
+    )
+    parser.add_argument('--cases', nargs='+', choices=tuple(CASES), default=tuple(CASES))
+    parser.add_argument(
+        '--operations', type=int,
+        help='measured operations per case, case default if not set',
+    )
+    parser.add_argument('--save-baseline', metavar='PATH', help='save results as a baseline')
+    parser.add_argument('--baseline', metavar='PATH', help='compare results with a baseline')
+    parser.add_argument(
+        '--threshold', type=float, default=baselines.DEFAULT_THRESHOLD,
+        help='allowed relative slowdown against the baseline',
+    )
+
+    return parser.parse_args(argv)
+
+
+def format_comparison(comparison):
+    result = comparison.result
+    seconds = baselines.seconds_per_operation(result)
+    line = (
+        f'{result.name:<32} {result.database:<6} {result.size:>8} '
+        f'{1 / seconds:>12.1f} ops/s {seconds * 1000:>10.3f} ms/op '
+        f'{baselines.queries_per_operation(result):>7.2f} queries/op'
+    )
+
+    if comparison.regressions:
+        return f'{line}  REGRESSION: {", ".join(comparison.regressions)}'
+    if comparison.baseline is not None:
+        expected = comparison.baseline['seconds_per_operation']
+        return f'{line}  {seconds / expected - 1:+.0%}'
+
+    return line
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    baseline = baselines.load(args.baseline) if args.baseline else {}
+
+    results = []
+    regressed = False
+    for result in run(args.databases, args.sizes, args.cases, args.operations):
+        results.append(result)
+        comparison = next(baselines.compare([result], baseline, args.threshold))
+        regressed = regressed or bool(comparison.regressions)
+        print(format_comparison(comparison), flush=True)
+
+    if args.save_baseline:
+        baselines.dump(results, args.save_baseline)
+
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
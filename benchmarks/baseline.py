@@ -0,0 +1,70 @@
+import json
+from collections import namedtuple
+
+from benchmarks.suite import result_key
+
+
+DEFAULT_THRESHOLD = 0.2
+
+Comparison = namedtuple('Comparison', ('result', 'baseline', 'regressions'))
+
+
+def seconds_per_operation(result):
+    return result.seconds / result.operations
+
+
+def queries_per_operation(result):
+    return result.queries / result.operations
+
+
+def dump(results, path):
+    """
+    Save results as a JSON baseline.
+
+    :param results: iterable: benchmark results
+    :param path: str: baseline file path
+    """
+    baseline = {
+        result_key(result): {
+            'seconds_per_operation': seconds_per_operation(result),
+            'queries_per_operation': queries_per_operation(result),
+        }
+        for result in results
+    }
+
+    with open(path, 'w') as baseline_file:
+        json.dump({'results': baseline}, baseline_file, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as baseline_file:
+        return json.load(baseline_file)['results']
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare results with a baseline. A result regresses when it is more than `threshold` slower
+    than the baseline or executes more queries per operation. Query counts are deterministic, so
+    no threshold is applied to them.
+
+    :param results: iterable: benchmark results
+    :param baseline: dict: loaded baseline
+    :param threshold: float: allowed relative slowdown
+    :return: generator of Comparison
+    """
+    for result in results:
+        expected = baseline.get(result_key(result))
+        regressions = []
+
+        if expected is not None:
+            slowdown = seconds_per_operation(result) / expected['seconds_per_operation'] - 1
+            if slowdown > threshold:
+                regressions.append(f'time +{slowdown:.0%}')
+
+            if queries_per_operation(result) > expected['queries_per_operation']:
+                regressions.append(
+                    f'queries {expected["queries_per_operation"]:.2f} -> '
+                    f'{queries_per_operation(result):.2f}',
+                )
+
+        yield Comparison(result, expected, regressions)
@@ -0,0 +1,43 @@
+import peewee
+
+from connect.utils.peewee.mixins import OrderedModelMixin, TransactionalIDMixin, VerboseIDMixin
+
+
+database = peewee.DatabaseProxy()
+
+
+class VerboseRecord(VerboseIDMixin):
+    @property
+    def prefix(self):
+        return 'BV'
+
+    class Meta:
+        database = database
+
+
+class ChainedRecord(TransactionalIDMixin):
+    CHAIN_FIELD = 'parent'
+
+    parent = peewee.ForeignKeyField(VerboseRecord)
+
+    @property
+    def prefix(self):
+        return 'BC'
+
+    class Meta:
+        database = database
+
+
+class OrderedRecord(OrderedModelMixin):
+    class Meta:
+        database = database
+
+
+class GapOrderedRecord(OrderedModelMixin):
+    SORT_MODE = OrderedModelMixin.SORT_MODE_GAP
+
+    class Meta:
+        database = database
+
+
+MODELS = (VerboseRecord, ChainedRecord, OrderedRecord, GapOrderedRecord)
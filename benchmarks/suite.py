@@ -0,0 +1,254 @@
+import contextlib
+import functools
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+import peewee
+
+from benchmarks import models
+from benchmarks.models import (
+    ChainedRecord,
+    GapOrderedRecord,
+    OrderedRecord,
+    VerboseRecord,
+)
+from connect.utils.peewee.utils import generate_verbose_id, verbose_id_format
+
+
+DATABASES = ('memory', 'file')
+SIZES = (1000, 10000, 100000, 1000000)
+SORT_DISTANCES = (1, 10, 100, 1000, 10000, 100000)
+CHAIN_LENGTH = 10
+
+Result = namedtuple('Result', ('name', 'database', 'size', 'operations', 'seconds', 'queries'))
+Case = namedtuple('Case', ('func', 'operations', 'sized'))
+
+
+def result_key(result):
+    return f'{result.name}/{result.database}/{result.size}'
+
+
+class Probe:
+    """
+    Accumulates wall time and number of executed SQL statements (including transaction
+    statements) of measured blocks.
+    """
+    def __init__(self, database):
+        self.database = database
+        self.seconds = 0.0
+        self.queries = 0
+
+    @contextlib.contextmanager
+    def measure(self):
+        replaced = vars(self.database).get('execute_sql')
+        execute_sql = self.database.execute_sql
+
+        @functools.wraps(execute_sql)
+        def counted_execute_sql(*args, **kwargs):
+            self.queries += 1
+            return execute_sql(*args, **kwargs)
+
+        self.database.execute_sql = counted_execute_sql
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds += time.perf_counter() - started
+            # Restore wrappers installed by others, f.e. by the metrics module
+            if replaced is None:
+                del self.database.execute_sql
+            else:
+                self.database.execute_sql = replaced
+
+
+def _suffix(index, length):
+    # Scatter sequential indexes over the ID space, so existing IDs look random.
+    space = 9 * 10 ** (length - 1)
+    return str(10 ** (length - 1) + index * 48271 % space)
+
+
+def _verbose_id(index, record=VerboseRecord()):
+    return record._wrap_sequence(_suffix(index, record.SUFFIX_LENGTH))
+
+
+def _chained_id(index, record=ChainedRecord()):
+    parent_id = _verbose_id(index // CHAIN_LENGTH)
+    base_id = parent_id.split(record.SEPARATOR, 1)[1]
+    chain_id = index % CHAIN_LENGTH + 1
+    return f'{record.prefix}{record.SEPARATOR}{base_id}{record.SEPARATOR}{chain_id:03}'
+
+
+def _insert(model, fields, rows):
+    database = model._meta.database
+    sql = 'INSERT INTO "{table}" ({columns}) VALUES ({params})'.format(
+        table=model._meta.table_name,
+        columns=', '.join(f'"{field.column_name}"' for field in fields),
+        params=', '.join('?' * len(fields)),
+    )
+
+    with database.atomic():
+        database.cursor().executemany(sql, rows)
+
+
+def populate(size):
+    """
+    Fill benchmark tables with `size` rows each. Rows are inserted directly, so populating does
+    not depend on the code being measured.
+    """
+    _insert(VerboseRecord, (VerboseRecord.id,), ((_verbose_id(index),) for index in range(size)))
+    _insert(
+        ChainedRecord,
+        (ChainedRecord.id, ChainedRecord.chain_id, ChainedRecord.parent),
+        (
+            (_chained_id(index), index % CHAIN_LENGTH + 1, _verbose_id(index // CHAIN_LENGTH))
+            for index in range(size)
+        ),
+    )
+
+    for model in (OrderedRecord, GapOrderedRecord):
+        step = model.ORDER_POSITION_STEP
+        _insert(model, (model.position,), (((index + 1) * step,) for index in range(size)))
+
+
+def bench_generate_verbose_id(database, size, operations):
+    probe = Probe(database)
+    with probe.measure():
+        for _ in range(operations):
+            generate_verbose_id('BV', VerboseRecord.SUFFIX_LENGTH, None, VerboseRecord.SEPARATOR)
+
+    yield 'generate_verbose_id', probe
+
+
+def bench_generate_many(database, size, operations):
+    id_format = verbose_id_format(
+        'BV', VerboseRecord.SUFFIX_LENGTH, None, VerboseRecord.SEPARATOR,
+    )
+
+    probe = Probe(database)
+    with probe.measure():
+        id_format.generate_many(operations)
+
+    yield 'generate_many', probe
+
+
+def bench_verbose_save(database, size, operations):
+    records = [VerboseRecord() for _ in range(operations)]
+
+    probe = Probe(database)
+    with probe.measure():
+        for record in records:
+            record.save()
+
+    yield 'verbose_save', probe
+
+
+def bench_transactional_save(database, size, operations):
+    chains = max(size // CHAIN_LENGTH, 1)
+    records = [
+        ChainedRecord(parent=VerboseRecord(id=_verbose_id(index % chains)))
+        for index in range(operations)
+    ]
+
+    probe = Probe(database)
+    with probe.measure():
+        for record in records:
+            record.save()
+
+    yield 'transactional_save', probe
+
+
+def bench_ordered_append(database, size, operations):
+    records = [OrderedRecord() for _ in range(operations)]
+
+    probe = Probe(database)
+    with probe.measure():
+        for record in records:
+            record.save()
+
+    yield 'ordered_append', probe
+
+
+def _sort_latency(database, model, size, distance, operations):
+    start = (size - distance) // 2
+    rows = model.select(model.id).order_by(model.position).tuples()
+    pk = rows.offset(start).limit(1).scalar()
+    target_pk = rows.offset(start + distance).limit(1).scalar()
+
+    probe = Probe(database)
+    for _ in range(operations):
+        obj, target = model.get_by_id(pk), model.get_by_id(target_pk)
+        with database.atomic() as transaction:
+            with probe.measure():
+                obj.sort(after=target)
+            transaction.rollback()
+
+    return probe
+
+
+def bench_sort(database, size, operations):
+    for model in (OrderedRecord, GapOrderedRecord):
+        for distance in SORT_DISTANCES:
+            if distance >= size:
+                break
+
+            probe = _sort_latency(database, model, size, distance, operations)
+            yield f'sort_{model.SORT_MODE}_distance_{distance}', probe
+
+
+CASES = {
+    'generate_verbose_id': Case(bench_generate_verbose_id, 100000, False),
+    'generate_many': Case(bench_generate_many, 100000, False),
+    'verbose_save': Case(bench_verbose_save, 500, True),
+    'transactional_save': Case(bench_transactional_save, 500, True),
+    'ordered_append': Case(bench_ordered_append, 500, True),
+    'sort': Case(bench_sort, 20, True),
+}
+
+
+def _run_case(case, database, database_kind, size, operations):
+    operations = operations or case.operations
+    for name, probe in case.func(database, size, operations):
+        yield Result(name, database_kind, size, operations, probe.seconds, probe.queries)
+
+
+def _connect(database_kind, directory, size):
+    if database_kind == 'memory':
+        return peewee.SqliteDatabase(':memory:')
+
+    return peewee.SqliteDatabase(os.path.join(directory, f'benchmark_{size}.db'))
+
+
+def run(databases=DATABASES, sizes=SIZES, case_names=tuple(CASES), operations=None):
+    """
+    Run benchmark cases against every database kind and table size.
+
+    :param databases: iterable: database kinds, 'memory' and/or 'file' (SQLite)
+    :param sizes: iterable: table sizes
+    :param case_names: iterable: names of CASES to run
+    :param operations: int: number of measured operations, case default if None
+    :return: generator of Result
+    """
+    cases = [CASES[name] for name in case_names]
+
+    for case in cases:
+        if not case.sized:
+            yield from _run_case(case, peewee.SqliteDatabase(':memory:'), 'none', 0, operations)
+
+    sized_cases = [case for case in cases if case.sized]
+    if not sized_cases:
+        return
+
+    for database_kind in databases:
+        with tempfile.TemporaryDirectory() as directory:
+            for size in sizes:
+                database = _connect(database_kind, directory, size)
+                models.database.initialize(database)
+                database.create_tables(models.MODELS)
+                populate(size)
+
+                for case in sized_cases:
+                    yield from _run_case(case, database, database_kind, size, operations)
+
+                database.close()
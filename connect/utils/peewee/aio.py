@@ -0,0 +1,68 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+MAX_WORKERS = 8
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Return the executor used by the async model methods. It is created lazily with
+    MAX_WORKERS threads, so the number of concurrently used database connections is bounded.
+
+    :return: executor instance
+    :rtype: concurrent.futures.Executor
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_WORKERS,
+                thread_name_prefix='peewee-model-utils',
+            )
+
+    return _executor
+
+
+def set_executor(executor):
+    """
+    Replace the executor used by the async model methods. The previous executor is not shut
+    down.
+
+    :param executor: concurrent.futures.Executor: executor instance or None to use the default
+    """
+    global _executor
+
+    with _executor_lock:
+        _executor = executor
+
+
+def _call_with_connection(database, func, args, kwargs):
+    # The connection is left open, so every worker thread reuses one connection
+    database.connect(reuse_if_open=True)
+    return func(*args, **kwargs)
+
+
+async def run_sync(database, func, *args, **kwargs):
+    """
+    Run blocking `func` in the executor. peewee keeps connection state per thread, so every
+    worker opens its own connection to `database` on first use and keeps it open for the next
+    calls. The executor therefore holds up to MAX_WORKERS connections (connections of a pooled
+    database stay checked out), which are closed when the worker threads exit. In-memory
+    SQLite can not be used, as every connection opens a separate empty database.
+
+    :param database: peewee.Database: database used by `func`
+    :param func: callable: blocking callable
+    :return: result of `func`
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(),
+        functools.partial(_call_with_connection, database, func, args, kwargs),
+    )
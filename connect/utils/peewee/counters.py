@@ -0,0 +1,76 @@
+import threading
+
+import peewee
+
+
+COUNTER_TABLE_NAME = 'model_utils_counter'
+
+_counter_models = {}
+_counter_models_lock = threading.Lock()
+
+
+class CounterBase(peewee.Model):
+    """
+    Named counters shared by all processes using the same database.
+    """
+    name = peewee.CharField(primary_key=True)
+    value = peewee.BigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+def counter_model(database):
+    """
+    Return counter model bound to the passed database. The model class is created once per
+    database, so it can be passed to `create_tables` or to migrations.
+
+    :param database: peewee.Database: database instance
+    :return: counter model class
+    :rtype: type
+    """
+    with _counter_models_lock:
+        model = _counter_models.get(database)
+        if model is None:
+            meta = type('Meta', (), {'database': database, 'table_name': COUNTER_TABLE_NAME})
+            model = type('Counter', (CounterBase,), {'Meta': meta, '__module__': __name__})
+            _counter_models[database] = model
+
+    return model
+
+
+def _increment(model, name, step):
+    query = model.update(value=model.value + step).where(model.name == name)
+
+    if model._meta.database.returning_clause:
+        rows = list(query.returning(model.value).tuples().execute())
+        return rows[0][0] if rows else None
+
+    if query.execute():
+        return model.select(model.value).where(model.name == name).scalar()
+    return None
+
+
+def advance_counter(database, name, step=1, initial=0):
+    """
+    Atomically advance named counter and return its new value. Missing counter is created
+    with the initial value first.
+
+    :param database: peewee.Database: database instance
+    :param name: str: counter name
+    :param step: int: increment
+    :param initial: int or callable: initial counter value, callable is evaluated only when
+        counter is created
+    :return: counter value after increment
+    :rtype: int
+    """
+    model = counter_model(database)
+
+    with database.atomic():
+        value = _increment(model, name, step)
+        if value is None:
+            initial_value = initial() if callable(initial) else initial
+            model.insert(name=name, value=initial_value).on_conflict_ignore().execute()
+            value = _increment(model, name, step)
+
+    return value
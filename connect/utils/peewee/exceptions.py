@@ -52,3 +52,45 @@ class InvalidVerboseIdException(CommonModelMixinException):
     """
     def __init__(self, id_value):
         super().__init__(f'Invalid Verbose ID passed: {id_value}')
+
+
+class IDSpaceExhaustedException(CommonModelMixinException):
+    """
+    All verbose ID values available for the model were already allocated
+    """
+    def __init__(self, class_instance):
+        super().__init__(f'Verbose ID space is exhausted for {class_instance}')
+
+
+class IDSpaceSaturatedException(CommonModelMixinException):
+    """
+    Verbose ID space of the model is filled above the configured threshold
+    """
+    def __init__(self, class_instance, collision_probability):
+        super().__init__(
+            f'Verbose ID space of {class_instance} is saturated, '
+            f'collision probability is {collision_probability:.2%}',
+        )
+
+
+class AmbiguousPrefixException(CommonModelMixinException):
+    """
+    Verbose ID prefix is used by several models
+    """
+    def __init__(self, prefix, models):
+        self.prefix = prefix
+        self.models = models
+
+        super().__init__(f'Verbose ID prefix {prefix} is used by several models: {models}')
+
+
+class PartitionClaimedException(CommonModelMixinException):
+    """
+    Verbose ID partition is already claimed by another node
+    """
+    def __init__(self, class_instance, node_id):
+        self.node_id = node_id
+
+        super().__init__(
+            f'Verbose ID partition {node_id} of {class_instance} is claimed by another node',
+        )
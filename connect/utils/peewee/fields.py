@@ -0,0 +1,109 @@
+import peewee
+
+from connect.utils.peewee.exceptions import InvalidVerboseIdException
+from connect.utils.peewee.utils import verbose_id_format
+
+
+class VerboseIDField(peewee.BigIntegerField):
+    """
+    Stores verbose ID as BIGINT of its digits, f.e. 'PRD-123-456-789' is stored as 123456789.
+    IDs are rendered when loaded and parsed when passed to queries, so models work with verbose
+    strings, while indexes, foreign keys and joins use integers.
+
+    For transactional models chain_length is the SUFFIX_LENGTH of the model and suffix
+    parameters describe the chain parent, f.e. 'R-123-456-789-001' is stored as 123456789001.
+
+    Examples:
+        class Product(VerboseIDMixin):
+            id = VerboseIDField('PRD', primary_key=True)
+
+        class Request(TransactionalIDMixin):
+            SUFFIX_LENGTH = 3
+            CHAIN_FIELD = 'product'
+
+            id = VerboseIDField('R', chain_length=3, primary_key=True)
+            product = peewee.ForeignKeyField(Product)  # BIGINT column
+    """
+    MAX_DIGITS = 18
+
+    def __init__(
+        self,
+        prefix,
+        suffix_length=9,
+        separator_frequency=None,
+        separator='-',
+        chain_length=0,
+        *args,
+        **kwargs,
+    ):
+        if suffix_length + chain_length > self.MAX_DIGITS:
+            raise ValueError(f'Verbose ID with more than {self.MAX_DIGITS} digits does not fit.')
+
+        self.id_format = verbose_id_format(prefix, suffix_length, separator_frequency, separator)
+        self.chain_length = chain_length
+        self.digits = suffix_length + chain_length
+        super().__init__(*args, **kwargs)
+
+    def parse(self, id_value):
+        """
+        :param str id_value: verbose id
+        :return: stored number or None if value is not a verbose id of this field
+        :rtype: int
+        """
+        base_id = self.id_format.base_id(id_value)
+        if base_id is None:
+            return None
+
+        digits = base_id.replace(self.id_format.separator, '')
+        if len(digits) != self.digits or not (digits.isascii() and digits.isdigit()):
+            return None
+
+        return int(digits)
+
+    def render(self, number):
+        """
+        :param int number: stored number
+        :return: verbose id
+        :rtype: str
+        """
+        digits = str(number).zfill(self.digits)
+        if not self.chain_length:
+            return self.id_format.render(digits)
+
+        return '{base}{separator}{chain}'.format(
+            base=self.id_format.render(digits[:-self.chain_length]),
+            separator=self.id_format.separator,
+            chain=digits[-self.chain_length:],
+        )
+
+    def db_value(self, value):
+        if value is None or isinstance(value, int):
+            return value
+
+        number = self.parse(value)
+        if number is None:
+            raise InvalidVerboseIdException(value)
+
+        return number
+
+    def python_value(self, value):
+        if value is None:
+            return value
+
+        return self.render(value)
+
+    def startswith(self, value):
+        """
+        Verbose ID prefix lookup, translated to a range of stored numbers.
+        """
+        base_id = self.id_format.base_id(value)
+        if base_id is None:
+            return peewee.SQL('1 = 0')
+
+        digits = base_id.replace(self.id_format.separator, '')
+        remaining = self.digits - len(digits)
+        if remaining < 0 or digits and not (digits.isascii() and digits.isdigit()):
+            return peewee.SQL('1 = 0')
+
+        low = int(digits or 0) * 10 ** remaining
+        return self.between(low, low + 10 ** remaining - 1)
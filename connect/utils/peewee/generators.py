@@ -0,0 +1,410 @@
+import collections
+import concurrent.futures
+import hashlib
+import logging
+import math
+import os
+import random
+import secrets
+import socket
+import threading
+import time
+
+import peewee
+
+from connect.utils.peewee.counters import advance_counter, counter_model
+from connect.utils.peewee.exceptions import IDSpaceExhaustedException, PartitionClaimedException
+from connect.utils.peewee.utils import id_space_size
+
+
+logger = logging.getLogger(__name__)
+
+
+class IDGenerator:
+    """
+    Base class for verbose ID suffix generators, which can be set as ID_GENERATOR of
+    VerboseIDMixin models. Generator returns numeric suffix, which is wrapped by the model.
+    """
+    # If False, generated IDs are unique by construction and are not checked in the table
+    requires_check = True
+
+    def generate(self, instance):  # pragma: no cover
+        """
+        :param instance: model instance which needs an ID
+        :return: numeric string with instance.SUFFIX_LENGTH digits
+        :rtype: str
+        """
+        raise NotImplementedError
+
+
+def _run_on_own_connection(database, func, *args):
+    """
+    Run func in a separate thread with its own connection, so the changes it makes are
+    committed independently of the transaction of the calling thread and are kept when that
+    transaction is rolled back.
+
+    :param database: peewee.Database: database used by func
+    :param func: callable: blocking callable
+    :return: result of func
+    """
+    def run():
+        with database.connection_context():
+            return func(*args)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(run).result()
+
+
+def _scatter_multiplier(size):
+    multiplier = int(size * 0.6180339887) or 1
+    while math.gcd(multiplier, size) != 1:
+        multiplier += 1
+    return multiplier
+
+
+class BlockIDAllocator(IDGenerator):
+    """
+    Reserves blocks of IDs per model and prefix in a counter table (see counters.counter_model)
+    with one round trip and hands them out from an in-memory thread-safe pool. Pool is
+    refilled in a background thread when it runs low.
+
+    Counter values are mapped to the suffix space with a bijective scatter, so allocated IDs
+    are unique among all allocators sharing the counter table, but do not look sequential.
+    Blocks are reserved on a separate connection in their own transaction, so a rolled back
+    transaction of the caller does not return the reserved block to the counter.
+
+    Example:
+        class Request(VerboseIDMixin):
+            ID_GENERATOR = BlockIDAllocator(block_size=500)
+    """
+    requires_check = False
+
+    def __init__(self, block_size=1000, refill_threshold=0.2, background=True, check_existing=True):
+        """
+        :param int block_size: number of IDs reserved with one round trip
+        :param float refill_threshold: part of the block left in pool, when refill starts
+        :param bool background: refill pool in a background thread
+        :param bool check_existing: drop reserved IDs which are already present in the table
+        """
+        self.block_size = block_size
+        self.refill_size = int(block_size * refill_threshold)
+        self.background = background
+        self.check_existing = check_existing
+
+        self._pools = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def generate(self, instance):
+        key = (type(instance), instance.prefix)
+
+        with self._lock:
+            pool = self._pools.setdefault(key, collections.deque())
+            if not pool:
+                pool.extend(
+                    _run_on_own_connection(type(instance)._meta.database, self._reserve, instance),
+                )
+
+            sequence = pool.popleft()
+
+            if self.background and len(pool) <= self.refill_size and key not in self._threads:
+                thread = threading.Thread(
+                    target=self._background_refill,
+                    args=(key, instance),
+                    daemon=True,
+                )
+                self._threads[key] = thread
+                thread.start()
+
+        return sequence
+
+    def _background_refill(self, key, instance):
+        try:
+            with type(instance)._meta.database.connection_context():
+                sequences = self._reserve(instance)
+        except Exception:
+            logger.exception('Background refill of %s verbose ID pool failed.', key[1])
+            sequences = []
+
+        with self._lock:
+            self._pools[key].extend(sequences)
+            del self._threads[key]
+
+    def _reserve(self, instance):
+        model = type(instance)
+        size = id_space_size(model.SUFFIX_LENGTH)
+        low = 10 ** (model.SUFFIX_LENGTH - 1)
+        multiplier = _scatter_multiplier(size)
+
+        sequences = []
+        while not sequences:
+            end = advance_counter(
+                model._meta.database,
+                f'{model._meta.table_name}:{instance.prefix}',
+                self.block_size,
+            )
+            start = end - self.block_size
+            if start >= size:
+                raise IDSpaceExhaustedException(model)
+
+            sequences = [
+                str(low + value * multiplier % size) for value in range(start, min(end, size))
+            ]
+            if self.check_existing:
+                sequences = self._drop_existing(instance, sequences)
+
+        return sequences
+
+    @staticmethod
+    def _drop_existing(instance, sequences):
+        model = type(instance)
+        ids = {instance._wrap_sequence(sequence): sequence for sequence in sequences}
+        existing = set()
+        for batch in peewee.chunked(list(ids), model.ID_CHECK_BATCH_SIZE):
+            existing.update(model._existing_ids(batch))
+        return [sequence for id_value, sequence in ids.items() if id_value not in existing]
+
+
+class TimeOrderedIDGenerator(IDGenerator):
+    """
+    Generates suffixes, which leading digits are a coarse timestamp and trailing digits are
+    random. IDs created in the same period are close in the primary key index, so inserts are
+    append-mostly instead of hitting random index pages, while IDs remain hard to guess.
+
+    Timestamp digits wrap around after `9 * 10 ** (time_digits - 1)` periods (about 24 years
+    with default parameters). Random digits are checked for collisions like random IDs, so
+    the model SUFFIX_LENGTH must leave enough of them for the rate of inserts in one period.
+
+    Example:
+        class Request(VerboseIDMixin):
+            SUFFIX_LENGTH = 12
+            ID_GENERATOR = TimeOrderedIDGenerator(time_digits=4, resolution=24 * 60 * 60)
+    """
+    def __init__(self, time_digits=4, resolution=24 * 60 * 60, clock=time.time):
+        """
+        :param int time_digits: number of leading timestamp digits
+        :param int resolution: length of one timestamp period in seconds
+        :param clock: callable returning current timestamp in seconds
+        """
+        if time_digits <= 0:
+            raise ValueError('Time ordered IDs need at least one time digit.')
+
+        self.time_digits = time_digits
+        self.resolution = resolution
+        self.clock = clock
+
+    def time_sequence(self, timestamp):
+        """
+        :param float timestamp: unix timestamp
+        :return: leading digits of suffixes generated at the timestamp
+        :rtype: str
+        """
+        low = 10 ** (self.time_digits - 1)
+        return str(low + int(timestamp // self.resolution) % (9 * low))
+
+    def _random_length(self, instance):
+        length = instance.SUFFIX_LENGTH - self.time_digits
+        if length <= 0:
+            raise ValueError(
+                f'SUFFIX_LENGTH of {type(instance).__name__} must be greater than '
+                f'{self.time_digits} time digits.',
+            )
+        return length
+
+    def generate(self, instance):
+        length = self._random_length(instance)
+        return self.time_sequence(self.clock()) + str(random.randrange(10 ** length)).zfill(length)
+
+    def lowest_id(self, instance, timestamp):
+        """
+        Smallest ID, which can be generated at the timestamp, for index range scans of recent
+        rows: `Model.id >= generator.lowest_id(Model(), since)`. Ranges are valid until the
+        timestamp digits wrap around.
+
+        :param instance: model instance
+        :param float timestamp: unix timestamp
+        :return: verbose id
+        :rtype: str
+        """
+        return instance._wrap_sequence(
+            self.time_sequence(timestamp) + '0' * self._random_length(instance),
+        )
+
+
+class PartitionedIDGenerator(IDGenerator):
+    """
+    Splits the suffix space into partitions by node: the suffix starts with `0`, followed by
+    `node_digits` digits of the node ID and a per process counter. IDs of different nodes never
+    collide, so they are not checked in the table. Random and block reserved suffixes never
+    start with `0`, so a model with such IDs can switch to this generator.
+
+    Counter is seeded from the largest existing ID of the partition. The partition is claimed
+    in the counter table (see counters.counter_model) on first use or with `claim`, a partition
+    claimed by another owner raises PartitionClaimedException, so two nodes configured with
+    the same node ID can not generate the same IDs.
+
+    A claim is a lease, which is renewed while the owner generates IDs and expires `lease`
+    seconds after the last renewal, so the partition of a crashed or stopped process can be
+    claimed again without manual recovery. Clocks of the nodes must not differ by more than
+    half of the lease. Without explicit owner every process (including forked workers) is
+    a separate owner, so a restarted process claims the partition after the lease of the
+    previous one expires or is released with `release`. An explicit owner, f.e. a stable worker
+    name, re-claims its partitions straight after restart, but must be unique among processes.
+
+    Example:
+        class Request(VerboseIDMixin):
+            ID_GENERATOR = PartitionedIDGenerator(node_id=int(os.environ['NODE_ID']))
+    """
+    requires_check = False
+    # Counter value of a claim is `expiry timestamp * TOKEN_SPACE + owner token`
+    TOKEN_SPACE = 2 ** 28
+
+    def __init__(self, node_id, node_digits=3, owner=None, lease=60, clock=time.time):
+        """
+        :param int node_id: node identifier, less than 10 ** node_digits
+        :param int node_digits: number of leading suffix digits taken by the node ID
+        :param str owner: claim owner, unique per process by default
+        :param int lease: number of seconds the claim is kept without renewal
+        :param clock: callable returning current timestamp in seconds
+        """
+        if not 0 <= node_id < 10 ** node_digits:
+            raise ValueError(f'Node ID {node_id} does not fit into {node_digits} digits.')
+
+        self.node_id = node_id
+        self.node_digits = node_digits
+        self.owner = owner
+        self.lease = lease
+        self.clock = clock
+        self._nonce = secrets.token_hex(8)
+
+        self._pid = os.getpid()
+        self._counters = {}
+        self._renewals = {}
+        self._lock = threading.Lock()
+
+    @property
+    def token(self):
+        owner = self.owner or f'{socket.gethostname()}:{os.getpid()}:{self._nonce}'
+        digest = hashlib.blake2b(owner.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') % self.TOKEN_SPACE
+
+    def _check_process(self):
+        # Counters of a forked process are not claimed by it
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._counters.clear()
+            self._renewals.clear()
+
+    def _node_sequence(self):
+        # Leading zero keeps partitions out of the random suffix range
+        return '0' + str(self.node_id).zfill(self.node_digits)
+
+    def _counter_length(self, instance):
+        length = instance.SUFFIX_LENGTH - self.node_digits - 1
+        if length <= 0:
+            raise ValueError(
+                f'SUFFIX_LENGTH of {type(instance).__name__} must be greater than '
+                f'{self.node_digits + 1} partition digits.',
+            )
+        return length
+
+    def _claim_name(self, instance):
+        return f'{type(instance)._meta.table_name}:{instance.prefix}:node:{self.node_id}'
+
+    def claim(self, instance):
+        """
+        Claim or renew the node partition of the model and prefix, should be called at startup
+        to verify the configuration. The claim is committed on a separate connection, so it is
+        kept when the transaction of the caller is rolled back.
+
+        :param instance: model instance
+        :raises PartitionClaimedException: if the partition is claimed by another owner and its
+            lease has not expired
+        """
+        database = type(instance)._meta.database
+        name = self._claim_name(instance)
+        if not _run_on_own_connection(database, self._claim, database, name, self.clock()):
+            raise PartitionClaimedException(type(instance), self.node_id)
+
+    def _claim(self, database, name, now):
+        model = counter_model(database)
+        value = (int(now) + self.lease) * self.TOKEN_SPACE + self.token
+
+        with database.atomic():
+            current = model.select(model.value).where(model.name == name).scalar()
+            if current is None:
+                model.insert(name=name, value=value).on_conflict_ignore().execute()
+                return model.select(model.value).where(model.name == name).scalar() == value
+
+            expires, token = divmod(current, self.TOKEN_SPACE)
+            if token != self.token and expires >= now:
+                return False
+
+            # Compare and set, so only one of concurrent owners takes an expired claim over
+            return bool(model.update(value=value).where(
+                (model.name == name) & (model.value == current),
+            ).execute())
+
+    def release(self, instance):
+        """
+        Release the node partition of the model and prefix, f.e. at shutdown or when the node is
+        moved to another host.
+
+        :param instance: model instance
+        """
+        database = type(instance)._meta.database
+        _run_on_own_connection(database, self._release, database, self._claim_name(instance))
+
+        with self._lock:
+            self._counters.pop((type(instance), instance.prefix), None)
+            self._renewals.pop((type(instance), instance.prefix), None)
+
+    def _release(self, database, name):
+        model = counter_model(database)
+        with database.atomic():
+            current = model.select(model.value).where(model.name == name).scalar()
+            if current is not None and current % self.TOKEN_SPACE == self.token:
+                model.delete().where((model.name == name) & (model.value == current)).execute()
+
+    def _seed(self, instance):
+        model = type(instance)
+        pk_field = model._meta.primary_key
+        length = self._counter_length(instance)
+        node = self._node_sequence()
+
+        last_id = model.select(peewee.fn.MAX(pk_field)).where(pk_field.between(
+            instance._wrap_sequence(node + '0' * length),
+            instance._wrap_sequence(node + '9' * length),
+        )).scalar()
+        if last_id is None:
+            return 0
+
+        digits = instance._id_format().base_id(last_id).replace(model.SEPARATOR, '')
+        return int(digits[len(node):]) + 1
+
+    def generate(self, instance):
+        key = (type(instance), instance.prefix)
+        length = self._counter_length(instance)
+
+        with self._lock:
+            self._check_process()
+            value = self._counters.get(key)
+            now = self.clock()
+            if value is None or now >= self._renewals[key]:
+                try:
+                    self.claim(instance)
+                except PartitionClaimedException:
+                    self._counters.pop(key, None)
+                    raise
+
+                # Lease is renewed when half of it is left
+                self._renewals[key] = now + self.lease / 2
+                if value is None:
+                    value = self._seed(instance)
+
+            if value >= 10 ** length:
+                raise IDSpaceExhaustedException(type(instance))
+
+            self._counters[key] = value + 1
+
+        return self._node_sequence() + str(value).zfill(length)
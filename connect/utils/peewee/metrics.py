@@ -0,0 +1,184 @@
+import functools
+import logging
+import threading
+import time
+import weakref
+from collections import namedtuple
+
+import peewee
+
+
+logger = logging.getLogger(__name__)
+
+Event = namedtuple(
+    'Event',
+    ('model', 'operation', 'attempts', 'collisions', 'queries', 'rows', 'seconds', 'error'),
+)
+
+_sinks = []
+_wrapped_databases = weakref.WeakSet()
+_wrap_lock = threading.Lock()
+_MISSING = object()
+_local = threading.local()
+
+
+def add_sink(sink):
+    """
+    Register callable which is called with an Event after every instrumented operation.
+    Exceptions raised by sinks are logged and do not affect the operation.
+
+    Event fields:
+        * model - model class
+        * operation - 'generate_id', 'bulk_generate_ids', 'save', 'sort', 'sort_many',
+          'reorder' or 'rebalance'
+        * attempts - number of generated IDs, including regenerated ones
+        * collisions - number of generated IDs, which already existed
+        * queries - number of SQL statements executed by the operation thread
+        * rows - number of rows updated by ordering operations
+        * seconds - wall time
+        * error - exception raised by the operation or None
+
+    :param sink: callable: metrics sink
+    """
+    with _wrap_lock:
+        _sinks.append(sink)
+
+
+def remove_sink(sink):
+    """
+    Unregister metrics sink. When the last sink is removed, query counting wrappers are
+    removed from databases.
+
+    :param sink: callable: metrics sink
+    """
+    with _wrap_lock:
+        _sinks.remove(sink)
+        if not _sinks:
+            _unwrap_databases()
+
+
+def _active_trackers():
+    trackers = getattr(_local, 'trackers', None)
+    if trackers is None:
+        trackers = _local.trackers = []
+    return trackers
+
+
+def _is_wrapped(database):
+    execute_sql = vars(database).get('execute_sql')
+    while execute_sql is not None:
+        if getattr(execute_sql, 'counts_queries', False):
+            return True
+        execute_sql = getattr(execute_sql, '__wrapped__', None)
+
+    return False
+
+
+def _count_queries(database):
+    if isinstance(database, peewee.Proxy):
+        database = database.obj
+
+    with _wrap_lock:
+        if _is_wrapped(database):
+            return
+
+        execute_sql = database.execute_sql
+
+        @functools.wraps(execute_sql)
+        def counted_execute_sql(*args, **kwargs):
+            # Nested wrappers (f.e. installed again over a foreign wrapper) count only once
+            if getattr(_local, 'counting', False):
+                return execute_sql(*args, **kwargs)
+
+            for tracker in getattr(_local, 'trackers', ()):
+                tracker.queries += 1
+            _local.counting = True
+            try:
+                return execute_sql(*args, **kwargs)
+            finally:
+                _local.counting = False
+
+        counted_execute_sql.counts_queries = True
+        counted_execute_sql.replaced = vars(database).get('execute_sql', _MISSING)
+        database.execute_sql = counted_execute_sql
+        _wrapped_databases.add(database)
+
+
+def _unwrap_databases():
+    for database in list(_wrapped_databases):
+        execute_sql = vars(database).get('execute_sql')
+        while getattr(execute_sql, 'counts_queries', False):
+            if execute_sql.replaced is _MISSING:
+                del database.execute_sql
+            else:
+                database.execute_sql = execute_sql.replaced
+            execute_sql = vars(database).get('execute_sql')
+
+    _wrapped_databases.clear()
+
+
+class _NullTracker:
+    attempts = collisions = queries = rows = 0
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TRACKER = _NullTracker()
+
+
+class _Tracker:
+    def __init__(self, model, operation):
+        self.model = model
+        self.operation = operation
+        self.attempts = self.collisions = self.queries = self.rows = 0
+
+    def __enter__(self):
+        _count_queries(self.model._meta.database)
+        _active_trackers().append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self.started
+        _active_trackers().remove(self)
+
+        event = Event(
+            self.model,
+            self.operation,
+            self.attempts,
+            self.collisions,
+            self.queries,
+            self.rows,
+            seconds,
+            exc,
+        )
+        for sink in list(_sinks):
+            try:
+                sink(event)
+            except Exception:
+                logger.exception('Metrics sink %r failed.', sink)
+
+        return False
+
+
+def track(model, operation):
+    """
+    Context manager collecting metrics of model operation. Instrumented code increments
+    `attempts`, `collisions` and `rows` of the returned tracker. Without registered sinks a shared
+    no-op tracker is returned, so nothing is measured.
+
+    :param model: model class
+    :param operation: str: operation name
+    :return: tracker
+    """
+    if not _sinks:
+        return _NULL_TRACKER
+
+    return _Tracker(model, operation)
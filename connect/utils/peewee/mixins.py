@@ -1,7 +1,46 @@
+import collections
+import contextlib
+import functools
+import logging
+import operator
+import threading
+
 import peewee
 
-from connect.utils.peewee.models import TransactionalIDBase, VerboseBase
-from connect.utils.peewee.utils import generate_verbose_id
+from connect.utils.peewee import metrics
+from connect.utils.peewee.counters import advance_counter
+from connect.utils.peewee.exceptions import IDSpaceSaturatedException, MissedPositionFieldException
+from connect.utils.peewee.fields import VerboseIDField
+from connect.utils.peewee.models import OrderedBase, TransactionalIDBase, VerboseBase
+from connect.utils.peewee.utils import (
+    collision_probability,
+    expected_retries,
+    generate_verbose_id,
+    id_space_size,
+    rank_after,
+    rank_between,
+    recommend_suffix_length,
+    spaced_rank,
+)
+
+
+logger = logging.getLogger(__name__)
+
+_tail_positions = {}
+_tail_positions_lock = threading.Lock()
+
+IDSpaceReport = collections.namedtuple(
+    'IDSpaceReport',
+    (
+        'model',
+        'rows',
+        'space',
+        'collision_probability',
+        'expected_retries',
+        'failure_probability',
+        'recommended_suffix_length',
+    ),
+)
 
 
 class VerboseIDMixin(VerboseBase):
@@ -12,6 +51,7 @@ class VerboseIDMixin(VerboseBase):
             * SEPARATOR - symbol (or substring) to separate ID parts, default '-'
             * SUFFIX_LENGTH - number of digits, default 9
             * SEPARATOR_FREQUENCY - digits in one chunk, default 3 or 4, depending on SUFFIX_LENGTH
+            * ID_GENERATOR - optional generators.IDGenerator producing the numeric suffix
 
         For example:
             prefix='PRD', SUFFIX_LENGTH=5, SEPARATOR_FREQUENCY=5: 'PRD-12345'
@@ -19,12 +59,23 @@ class VerboseIDMixin(VerboseBase):
             prefix='AGP', SUFFIX_LENGTH=12, SEPARATOR_FREQUENCY=5: 'AGP-12345-12345-12'
             prefix='TCR', SUFFIX_LENGTH=7, SEPARATOR_FREQUENCY=None: 'TCR-123-123-1'
 
-        IMPORTANT: This mixin can not be used for bulk_create operations.
+        IDs for bulk_create operations are generated in bulk, see VerboseBase.bulk_create.
+        Models overriding _generate_id get bulk IDs from it as well.
+
+        Occupancy of the ID space can be checked with id_space_report and check_id_space.
         """
     SUFFIX_LENGTH = 9
-    SEPARATOR_FREQUENCY = None
+    # Collision probability at which check_id_space warns or, with ID_SPACE_FAIL_FAST, raises
+    ID_SPACE_THRESHOLD = 0.01
+    ID_SPACE_FAIL_FAST = False
+
+    def _wrap_sequence(self, sequence):
+        return self._id_format().render(sequence)
 
     def _generate_id(self, using=None, iteration=0):
+        if self.ID_GENERATOR is not None:
+            return self._wrap_sequence(self.ID_GENERATOR.generate(self))
+
         return generate_verbose_id(
             self.prefix,
             self.SUFFIX_LENGTH,
@@ -32,16 +83,120 @@ class VerboseIDMixin(VerboseBase):
             self.SEPARATOR,
         )
 
+    @classmethod
+    def _assign_ids(cls, instances):
+        # Custom generators and overridden _generate_id get the instances one by one
+        if cls.ID_GENERATOR is not None or cls._generate_id is not VerboseIDMixin._generate_id:
+            return super()._assign_ids(instances)
+
+        by_format = collections.defaultdict(list)
+        for instance in instances:
+            by_format[instance._id_format()].append(instance)
+
+        for id_format, group in by_format.items():
+            for instance, pk in zip(group, id_format.generate_many(len(group))):
+                instance.id = pk
+
+    @classmethod
+    def _estimate_rows(cls, prefix=None):
+        if prefix is not None:
+            return cls.select().where(cls.id.startswith(f'{prefix}{cls.SEPARATOR}')).count()
+
+        database = cls._meta.database
+        if isinstance(database, peewee.PostgresqlDatabase):
+            table = '.'.join(filter(None, (cls._meta.schema, cls._meta.table_name)))
+            estimate = database.execute_sql(
+                'SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)',
+                (table,),
+            ).fetchone()
+            if estimate and estimate[0] >= 0:
+                return int(estimate[0])
+
+        return cls.select().count()
+
+    @classmethod
+    def id_space_report(cls, rows=None, prefix=None, target_rows=None):
+        """
+        Estimates occupancy of the random ID space. Rows are counted in the table, on
+        PostgreSQL planner statistics are used instead of COUNT(*) when all rows are counted.
+
+            :param rows: number of taken IDs, estimated if not passed
+            :param prefix: count only IDs with this prefix, all rows are counted by default
+            :param target_rows: row count for SUFFIX_LENGTH recommendation, rows by default
+            :return: IDSpaceReport
+        """
+        rows = cls._estimate_rows(prefix) if rows is None else rows
+        space = id_space_size(cls.SUFFIX_LENGTH)
+        probability = collision_probability(rows, space)
+
+        return IDSpaceReport(
+            cls,
+            rows,
+            space,
+            probability,
+            expected_retries(rows, space),
+            probability ** cls.MAX_ID_GENERATION_ITERATIONS,
+            recommend_suffix_length(
+                rows if target_rows is None else target_rows,
+                cls.ID_SPACE_THRESHOLD,
+            ),
+        )
+
+    @classmethod
+    def check_id_space(cls, rows=None, prefix=None):
+        """
+        Builds id_space_report and warns (or raises IDSpaceSaturatedException with
+        ID_SPACE_FAIL_FAST) when collision probability reaches ID_SPACE_THRESHOLD.
+
+            :return: IDSpaceReport
+        """
+        report = cls.id_space_report(rows, prefix)
+        if report.collision_probability >= cls.ID_SPACE_THRESHOLD:
+            if cls.ID_SPACE_FAIL_FAST:
+                raise IDSpaceSaturatedException(cls, report.collision_probability)
+
+            logger.warning(
+                'Verbose ID space of %s is %.2f%% full, expected retries per insert: %.3f, '
+                'recommended SUFFIX_LENGTH: %d.',
+                cls,
+                report.collision_probability * 100,
+                report.expected_retries,
+                report.recommended_suffix_length,
+            )
+
+        return report
 
-class OrderedModelMixin(peewee.Model):
+
+class OrderedModelMixin(OrderedBase):
     """
     The mixin adds integer property 'position' which allows to sort objects within queryset
     automatically. It also adds 'sort' method to put object after/before specified one in the
-    sequence.
+    sequence. Objects are ordered within ORDER_SCOPE, see OrderedBase.
+
+    SORT_MODE defines how 'sort' moves the object:
+        * SORT_MODE_SHIFT - object takes position of its new neighbour and all objects between
+          old and new position are shifted by ORDER_POSITION_STEP
+        * SORT_MODE_GAP - object is placed in the middle of the gap between its new neighbours,
+          only GAP_RENUMBER_WINDOW objects around are renumbered when the gap is exhausted
+        * SORT_MODE_SINGLE - like SORT_MODE_SHIFT, but the shift and the moved object are
+          updated by one UPDATE statement, which writes only positions. New position is taken
+          from the target object, moving to the top reads the first position first
+
+    With CACHE_TAIL_POSITION = True the last position of each scope is cached per process, so
+    appends do not query the table. The cache is updated on appends and is invalidated by
+    'sort' and 'delete_instance'. It should be used only when objects are appended by one
+    process, other changes of positions require 'invalidate_tail_cache' call.
     """
 
+    SORT_MODE_SHIFT = 'shift'
+    SORT_MODE_GAP = 'gap'
+    SORT_MODE_SINGLE = 'single'
+
     ORDER_POSITION_STEP = 10000
     START_POSITION = 0
+    SORT_MODE = SORT_MODE_SHIFT
+    GAP_RENUMBER_WINDOW = 8
+    CACHE_TAIL_POSITION = False
     is_position_up = True
 
     position = peewee.BigIntegerField(null=True, index=True)
@@ -49,24 +204,77 @@ class OrderedModelMixin(peewee.Model):
     class Meta:
         abstract = True
 
-    @property
-    def last_element(self):
-        return self.__class__.select().order_by(self.__class__.position.desc()).first()
+    def __append_positions(self, count=1):
+        if not self.CACHE_TAIL_POSITION:
+            return (self._max_position() or 0) + self.ORDER_POSITION_STEP
+
+        key = (self.__class__, self._scope_key())
+        with _tail_positions_lock:
+            tail = _tail_positions.get(key)
+            if tail is None:
+                tail = self._max_position() or 0
+            _tail_positions[key] = tail + self.ORDER_POSITION_STEP * count
+
+        return tail + self.ORDER_POSITION_STEP
+
+    def __remember_tail(self):
+        key = (self.__class__, self._scope_key())
+        with _tail_positions_lock:
+            if key in _tail_positions and _tail_positions[key] < self.position:
+                _tail_positions[key] = self.position
+
+    def __forget_tail(self):
+        with _tail_positions_lock:
+            _tail_positions.pop((self.__class__, self._scope_key()), None)
+
+    @classmethod
+    def invalidate_tail_cache(cls):
+        with _tail_positions_lock:
+            for key in [key for key in _tail_positions if key[0] is cls]:
+                del _tail_positions[key]
+
+    @classmethod
+    def assign_tail_positions(cls, model_list):
+        """
+        Assigns consecutive positions at the end of their scopes to instances without position.
+        Tail position of each scope is looked up once.
 
-    @property
-    def first_element(self):
-        return self.__class__.select().order_by(self.__class__.position.asc()).first()
+        :param list model_list: model instances
+        """
+        scopes = collections.defaultdict(list)
+        for instance in model_list:
+            if instance.position is None:
+                scopes[instance._scope_key()].append(instance)
+
+        for instances in scopes.values():
+            position = instances[0].__append_positions(len(instances))
+            for instance in instances:
+                instance.position = position
+                position += cls.ORDER_POSITION_STEP
+
+    @classmethod
+    def bulk_create(cls, model_list, batch_size=None):
+        cls.assign_tail_positions(model_list)
+        return super().bulk_create(model_list, batch_size=batch_size)
 
     def save(self, *args, **kwargs):
-        if not self.position:
-            self.position = getattr(self.last_element, 'position', 0) + self.ORDER_POSITION_STEP
+        if self.position is None:
+            self.position = self.__append_positions()
+        elif self.CACHE_TAIL_POSITION:
+            self.__remember_tail()
 
         super().save(*args, **kwargs)
 
+    def delete_instance(self, *args, **kwargs):
+        if self.CACHE_TAIL_POSITION:
+            self.__forget_tail()
+
+        return super().delete_instance(*args, **kwargs)
+
     def __update_position_query(self, is_position_up):
         mark = 1 if is_position_up else -1
-        return self.__class__.update(
-            position=self.__class__.position + mark * self.ORDER_POSITION_STEP)
+        return self._scope_filter(self.__class__.update(
+            position=self.__class__.position + mark * self.ORDER_POSITION_STEP))
 
     def __filter_by_gt_lt(self, query, gt_data, lte_data):
         filtered_resource = query.where(
@@ -100,7 +308,7 @@ class OrderedModelMixin(peewee.Model):
             # highest position but other resources positions should not be touched
 
             filtered_resources_select = self.__filter_by_gt_lt(
-                self.__class__.select(),
+                self._scope_filter(self.__class__.select()),
                 after.position,
                 self.position,
             )
@@ -132,6 +340,269 @@ class OrderedModelMixin(peewee.Model):
 
         return filtered_resource
 
+    @classmethod
+    def _rebalance_spacing(cls, owner, low, high, total):
+        query = owner._scope_filter(cls.select(cls.position))
+        lower = upper = None
+        if low is not None:
+            lower = query.where(cls.position < low).order_by(
+                cls.position.desc()).limit(1).scalar()
+        if high is not None:
+            upper = query.where(cls.position > high).order_by(
+                cls.position.asc()).limit(1).scalar()
+
+        if lower is not None and upper is not None:
+            step = (upper - lower) // (total + 1)
+            if step < 1:
+                raise ValueError("Positions range is too dense to rebalance.")
+            return lower, step
+        elif upper is not None:
+            return upper - cls.ORDER_POSITION_STEP * (total + 1), cls.ORDER_POSITION_STEP
+
+        return cls.START_POSITION if lower is None else lower, cls.ORDER_POSITION_STEP
+
+    @classmethod
+    def _rebalance_target(cls, spacing, rank):
+        lower, step = spacing
+        return lower + step * (rank + 1)
+
+    @classmethod
+    def iter_rebalance(cls, scope=None, low=None, high=None, chunk_size=None, checkpoint=None):
+        yield from super().iter_rebalance(scope, low, high, chunk_size, checkpoint)
+
+        if cls.CACHE_TAIL_POSITION:
+            cls.invalidate_tail_cache()
+
+    @classmethod
+    def __block_bounds(cls, scope_owner, pks, position, is_before):
+        query = scope_owner._scope_filter(
+            cls.select(cls.position).where(cls._meta.primary_key.not_in(pks)))
+
+        if is_before:
+            lower = query.where(cls.position < position).order_by(
+                cls.position.desc()).limit(1).scalar()
+            return lower, position
+
+        if position is not None:
+            query = query.where(cls.position > position)
+        upper = query.order_by(cls.position.asc()).limit(1).scalar()
+        return position, upper
+
+    @classmethod
+    def __open_gap(cls, scope_owner, pks, lower, upper):
+        min_step = cls.ORDER_POSITION_STEP if cls.SORT_MODE == cls.SORT_MODE_SHIFT else 2
+        required = min_step * (len(pks) + 1)
+
+        if upper is None:
+            lower = cls.START_POSITION if lower is None else lower
+            upper = lower + required
+        elif lower is None:
+            lower = cls.START_POSITION if upper > cls.START_POSITION else upper - required
+
+        shifted = 0
+        if upper - lower < required:
+            shift = required - (upper - lower)
+            shifted = scope_owner._scope_filter(
+                cls.update(position=cls.position + shift).where(
+                    cls.position >= upper, cls._meta.primary_key.not_in(pks)),
+            ).execute()
+            upper += shift
+
+        return lower, (upper - lower) // (len(pks) + 1), shifted
+
+    @classmethod
+    def sort_many(cls, instances, after=None, before=None):
+        """
+        Moves objects after/before the target object keeping their relative order. The gap for
+        the objects is opened with one shift of the following objects when it is too narrow and
+        objects are placed with one batched update.
+
+            :param instances: instances to move
+            :param before: target instance for before
+            :param after: target instance for after
+            :return: Nothing
+        """
+        target = before or after
+        scope_owner = target or instances[0]
+        pk_field = cls._meta.primary_key
+
+        pks = [instance._pk for instance in instances]
+        if target and target._pk in pks:
+            raise ValueError("Elements must be different.")
+        elif not all(scope_owner._in_same_scope(instance) for instance in instances):
+            raise ValueError("Elements must be in the same scope.")
+
+        with metrics.track(cls, 'sort_many') as tracker, cls._meta.database.atomic():
+            current = dict(
+                cls.select(pk_field, cls.position).where(
+                    pk_field.in_(pks + [target._pk] if target else pks)).tuples(),
+            )
+            instances = sorted(instances, key=lambda instance: (
+                current.get(instance._pk) is None,
+                current.get(instance._pk) or 0,
+            ))
+            lower, upper = cls.__block_bounds(
+                scope_owner,
+                pks,
+                current.get(target._pk) if target else None,
+                before is not None,
+            )
+            lower, step, tracker.rows = cls.__open_gap(scope_owner, pks, lower, upper)
+            for index, instance in enumerate(instances, start=1):
+                instance.position = lower + step * index
+            tracker.rows += cls._update_positions(
+                {instance._pk: instance.position for instance in instances},
+            )
+
+        if cls.CACHE_TAIL_POSITION:
+            cls.invalidate_tail_cache()
+
+    def __window_rows(self, cursor, is_next, size):
+        pk_field = self._meta.primary_key
+        if is_next:
+            condition = self._beyond_cursor(cursor)
+            order_by = (self.__class__.position.asc(), pk_field.asc())
+        else:
+            condition = self._beyond_cursor(cursor, descending=True, inclusive=True)
+            order_by = (self.__class__.position.desc(), pk_field.desc())
+
+        rows = list(
+            self._scope_filter(self.__class__.select(pk_field, self.__class__.position))
+            .where(condition, pk_field != self._pk)
+            .order_by(*order_by)
+            .limit(size + 1)
+            .tuples(),
+        )
+        bound = rows.pop()[1] if len(rows) > size else None
+        return rows, bound
+
+    @classmethod
+    def reorder(cls, pks):
+        """
+        Applies new order to objects of one scope. Objects take the positions they occupy now
+        in the order of passed primary keys, with one UPDATE per REORDER_BATCH_SIZE objects
+        in one transaction (rows are locked, where SELECT FOR UPDATE is supported). Objects
+        which are already in place are not updated.
+
+            :param pks: primary keys of objects in the new order
+            :return: number of updated objects
+        """
+        with metrics.track(cls, 'reorder') as tracker, cls._meta.database.atomic():
+            updated = tracker.rows = cls.__reorder(pks)
+            return updated
+
+    @classmethod
+    def __reorder(cls, pks):
+        pk_field = cls._meta.primary_key
+        scope_fields = [cls._meta.fields[name] for name in cls.ORDER_SCOPE]
+
+        current, scopes = {}, set()
+        for batch in peewee.chunked(pks, cls.REORDER_BATCH_SIZE):
+            query = cls.select(pk_field, cls.position, *scope_fields).where(pk_field.in_(batch))
+            if cls._meta.database.for_update:
+                query = query.for_update()
+
+            for pk, position, *scope in query.tuples():
+                current[pk] = position
+                scopes.add(tuple(scope))
+
+        if len(scopes) > 1:
+            raise ValueError("Elements must be in the same scope.")
+
+        pks = list(dict.fromkeys(pk for pk in pks if pk in current))
+        slots = sorted(position for position in current.values() if position is not None)
+        if len(set(slots)) < len(pks):
+            start = slots[0] if slots else cls.ORDER_POSITION_STEP
+            slots = [start + cls.ORDER_POSITION_STEP * index for index in range(len(pks))]
+
+        positions = {
+            pk: position for pk, position in zip(pks, slots) if current[pk] != position
+        }
+        if cls.CACHE_TAIL_POSITION:
+            cls.invalidate_tail_cache()
+
+        return cls._update_positions(positions)
+
+    def __renumber_window(self, lower):
+        # Window is split at the (position, primary key) of the lower neighbour, so objects
+        # sharing its position stay on their side
+        size = self.GAP_RENUMBER_WINDOW
+        while True:
+            rows_below, low = self.__window_rows(lower, False, size)
+            rows_above, high = self.__window_rows(lower, True, size)
+            rows = rows_below[::-1] + [(self._pk, None)] + rows_above
+
+            step = self.ORDER_POSITION_STEP
+            if low is None and high is None:
+                low = rows[0][1] - step
+            elif low is None:
+                low = high - step * (len(rows) + 1)
+            elif high is not None:
+                step = (high - low) // (len(rows) + 1)
+
+            if step > 1:
+                break
+            size *= 2
+
+        positions = {pk: low + step * (index + 1) for index, (pk, _) in enumerate(rows)}
+        self.position = positions.pop(self._pk)
+        return self._update_positions(positions)
+
+    def __sort_gap(self, after, before):
+        lower, upper = self._neighbours(after, before)
+
+        renumbered = 0
+        if lower is None and upper is None:
+            return 0
+        elif lower is None:
+            self.position = upper[0] - self.ORDER_POSITION_STEP
+        elif upper is None:
+            self.position = lower[0] + self.ORDER_POSITION_STEP
+        elif upper[0] - lower[0] > 1:
+            self.position = lower[0] + (upper[0] - lower[0]) // 2
+        else:
+            renumbered = self.__renumber_window(lower)
+
+        return renumbered + self.__class__.update(position=self.position).where(
+            self._meta.primary_key == self._pk).execute()
+
+    def __single_move(self, after, before):
+        cls = self.__class__
+        step = self.ORDER_POSITION_STEP
+        position = self.position
+
+        if before:
+            if before.position == position:
+                raise ValueError("Element 'before' is invalid.")
+            elif before.position < position:
+                target, shift = before.position, step
+                shifted = (cls.position >= before.position) & (cls.position < position)
+            else:
+                target, shift = max(before.position - step, position), -step
+                shifted = (cls.position > position) & (cls.position < before.position)
+        elif after is None:
+            target = self._ordered([cls.position]).limit(1).scalar()
+            shift, shifted = step, cls.position < position
+        elif after.position < position:
+            target, shift = min(after.position + step, position), step
+            shifted = (cls.position > after.position) & (cls.position < position)
+        else:
+            target, shift = after.position, -step
+            shifted = (cls.position > position) & (cls.position <= after.position)
+
+        return target, shift, shifted
+
+    def __sort_single(self, after, before):
+        target, shift, shifted = self.__single_move(after, before)
+        is_moved = self._meta.primary_key == self._pk
+
+        updated = self._scope_filter(self.__class__.update(
+            position=peewee.Case(None, [(is_moved, target)], self.__class__.position + shift),
+        ).where(shifted | is_moved)).execute()
+
+        self.position = target
+        return updated
+
     def sort(self, after=None, before=None):
         """
             :param before: target instance for before
@@ -140,13 +611,176 @@ class OrderedModelMixin(peewee.Model):
         """
         if before and self._pk == before._pk or after and self._pk == after._pk:
             raise ValueError("Elements must be different.")
-        elif before:
-            filtered_resource = self.__sort_before(before)
+        elif not self._in_same_scope(before or after or self):
+            raise ValueError("Elements must be in the same scope.")
+
+        if self.CACHE_TAIL_POSITION:
+            self.__forget_tail()
+
+        with metrics.track(self.__class__, 'sort') as tracker:
+            if self.SORT_MODE == self.SORT_MODE_GAP:
+                with self._meta.database.atomic():
+                    tracker.rows = self.__sort_gap(after, before)
+                return
+            elif self.SORT_MODE == self.SORT_MODE_SINGLE:
+                # Only moving to the top reads before the UPDATE and needs a transaction
+                to_top = before is None and after is None
+                with self._meta.database.atomic() if to_top else contextlib.nullcontext():
+                    tracker.rows = self.__sort_single(after, before)
+                return
+
+            if before:
+                filtered_resource = self.__sort_before(before)
+            else:
+                filtered_resource = self.__sort_after(after)
+
+            tracker.rows = filtered_resource.execute() + 1
+            self.save()
+
+
+class LexoRankOrderedModelMixin(OrderedBase):
+    """
+    Alternative to OrderedModelMixin, which stores position as variable length string rank.
+    Rank of a new or moved object is calculated from the ranks of its neighbours, so 'sort'
+    never updates other objects. Objects are ordered within ORDER_SCOPE, see OrderedBase.
+
+    Ranks grow with repeated inserts at the same place, 'sort' raises ValueError when the rank
+    does not fit into the position field. 'rebalance' (see OrderedBase.iter_rebalance) replaces
+    ranks of whole lists with short evenly spaced ranks in chunks.
+
+    To migrate a model from OrderedModelMixin, rename its integer position field, set the name
+    as POSITION_FIELD and call 'migrate_positions'.
+    """
+    POSITION_FIELD = None
+
+    position = peewee.CharField(null=True, index=True)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def assign_tail_positions(cls, model_list):
+        """
+        Assigns consecutive ranks after the current tail of their scopes to instances without
+        position, see rank_after. Tail rank of each scope is looked up once.
+
+        :param list model_list: model instances
+        """
+        scopes = collections.defaultdict(list)
+        for instance in model_list:
+            if instance.position is None:
+                scopes[instance._scope_key()].append(instance)
+
+        for instances in scopes.values():
+            position = instances[0]._max_position()
+            for instance in instances:
+                position = instance.position = rank_after(position)
+
+    @classmethod
+    def bulk_create(cls, model_list, batch_size=None):
+        cls.assign_tail_positions(model_list)
+        return super().bulk_create(model_list, batch_size=batch_size)
+
+    def save(self, *args, **kwargs):
+        if self.position is None:
+            self.position = rank_after(self._max_position())
+
+        super().save(*args, **kwargs)
+
+    def sort(self, after=None, before=None):
+        """
+            :param before: target instance for before
+            :param after: target instance for after
+            :return: Nothing
+        """
+        if before and self._pk == before._pk or after and self._pk == after._pk:
+            raise ValueError("Elements must be different.")
+        elif not self._in_same_scope(before or after or self):
+            raise ValueError("Elements must be in the same scope.")
+
+        lower, upper = self._neighbours(after, before)
+
+        if lower is not None and upper is not None and lower[0] == upper[0]:
+            positions = self.__spread_ties(lower)
+        elif upper is not None:
+            positions = {self._pk: rank_between(lower and lower[0], upper[0])}
         else:
-            filtered_resource = self.__sort_after(after)
+            positions = {self._pk: rank_after(lower and lower[0])}
+
+        if max(map(len, positions.values())) > self._meta.fields['position'].max_length:
+            raise ValueError("Rank is too long, rebalance the list.")
+
+        with metrics.track(self.__class__, 'sort') as tracker:
+            self.position = positions[self._pk]
+            tracker.rows = self._update_positions(positions)
+
+    def __spread_ties(self, lower):
+        # Objects sharing the rank of the lower neighbour and following it are moved after
+        # the object, ranks are taken between the tied rank and the next rank
+        cls = self.__class__
+        pk_field = cls._meta.primary_key
+        others = self._scope_filter(cls.select(pk_field).where(pk_field != self._pk))
+
+        tied = others.where(cls.position == lower[0], cls._beyond_cursor(lower))
+        upper = others.select(peewee.fn.MIN(cls.position)).where(cls.position > lower[0]).scalar()
+
+        positions, position = {}, lower[0]
+        for pk in (self._pk, *(pk for pk, in tied.order_by(pk_field).tuples())):
+            position = positions[pk] = (
+                rank_between(position, upper) if upper is not None else rank_after(position)
+            )
+
+        return positions
+
+    @classmethod
+    def _rebalance_spacing(cls, owner, low, high, total):
+        if low is not None or high is not None:
+            raise ValueError("String ranks can be rebalanced only for whole lists.")
+        return total
+
+    @classmethod
+    def _rebalance_target(cls, spacing, rank):
+        return spaced_rank(rank, spacing)
+
+    @classmethod
+    def migrate_positions(cls, chunk_size=None):
+        """
+        Sets evenly spaced ranks in the order of integer POSITION_FIELD values. Objects without
+        integer position are skipped.
 
-        filtered_resource.execute()
-        self.save()
+            :param chunk_size: number of objects updated in one transaction
+            :return: number of updated objects
+        """
+        if cls.POSITION_FIELD is None:
+            raise MissedPositionFieldException(cls)
+
+        source = cls._meta.fields[cls.POSITION_FIELD]
+        pk_field = cls._meta.primary_key
+        chunk_size = chunk_size or cls.REORDER_BATCH_SIZE
+
+        updated = 0
+        for owner in cls._scope_owners():
+            query = owner._scope_filter(
+                cls.select(pk_field, source).where(source.is_null(False)))
+            total = query.count()
+
+            index, rows = 0, list(query.order_by(source, pk_field).limit(chunk_size).tuples())
+            while rows:
+                with cls._meta.database.atomic():
+                    updated += cls._update_positions({
+                        pk: spaced_rank(index + offset, total)
+                        for offset, (pk, _) in enumerate(rows)
+                    })
+
+                index += len(rows)
+                last_pk, last_position = rows[-1]
+                rows = list(
+                    query.where((source > last_position) | (
+                        (source == last_position) & (pk_field > last_pk)))
+                    .order_by(source, pk_field).limit(chunk_size).tuples(),
+                )
+
+        return updated
 
 
 class TransactionalIDMixin(TransactionalIDBase):
@@ -154,7 +788,8 @@ class TransactionalIDMixin(TransactionalIDBase):
     Mixin for chaining (grouping) related instances with VerboseID. Chain of instances have the
     same ID base, but a different postfix (f.e. PRE-000-1, PRE-000-2).
 
-    IMPORTANT: This mixin can not be used for bulk_create operations.
+    IDs for bulk_create operations are generated in bulk: instances are grouped by chain and
+    get consecutive chain_ids, see TransactionalIDMixin._assign_ids.
 
     Examples:
         class Asset(VerboseIDMixin):
@@ -178,8 +813,12 @@ class TransactionalIDMixin(TransactionalIDBase):
     Notes:
         1) Chaining starts from 1. Old IDs with chain_id=-1 do not have -000 postfix.
         2) If we do not set CHAIN_FIELD for a given model, then it will throw error
+        3) With CHAIN_ID_COUNTER = True next chain_id is taken from a per parent counter in the
+           counter table (see counters.counter_model) instead of MAX(chain_id) query. Counter
+           is created from MAX(chain_id) on first use.
     """
     NO_VALUE = -1
+    CHAIN_ID_COUNTER = False
     chain_id = peewee.IntegerField(default=NO_VALUE)
 
     class Meta:
@@ -189,20 +828,139 @@ class TransactionalIDMixin(TransactionalIDBase):
     def prefix(self):
         raise NotImplementedError()
 
-    def _generate_id(self, iteration=0):
+    def _chain_id_prefix(self):
         chain_field = self._validate_chain_field()
         base_id = self._get_base_id(chain_field)
+        return f'{self.prefix}{self.SEPARATOR}{base_id}{self.SEPARATOR}'
+
+    @classmethod
+    def _chain_filter(cls, id_prefix):
+        # Range of the primary key index, LIKE alone is not indexed on all backends.
+        # All chain IDs have the same shape, so the range is correct for any collation.
+        if isinstance(cls._meta.primary_key, VerboseIDField):
+            return cls.id.startswith(id_prefix)
+
+        return cls.id.between(
+            f'{id_prefix}{"0" * cls.SUFFIX_LENGTH}',
+            f'{id_prefix}{"9" * cls.SUFFIX_LENGTH}',
+        ) & cls.id.startswith(id_prefix)
+
+    def _max_chain_id(self, id_prefix):
+        max_chain_id = self.__class__.select(
+            peewee.fn.MAX(self.__class__.chain_id)).where(
+            self._chain_filter(id_prefix)).scalar()
+
+        return max(max_chain_id or 0, 0)
+
+    def _next_chain_id(self, id_prefix):
+        if not self.CHAIN_ID_COUNTER:
+            return self._max_chain_id(id_prefix) + 1
+
+        return advance_counter(
+            self._meta.database,
+            f'{self._meta.table_name}:{id_prefix}',
+            initial=lambda: self._max_chain_id(id_prefix),
+        )
+
+    def _format_chain_id(self, id_prefix):
+        return f'{id_prefix}{self.chain_id:0{self.SUFFIX_LENGTH}}'
 
-        if iteration > 0:
+    def _generate_id(self, iteration=0):
+        id_prefix = self._chain_id_prefix()
+
+        if iteration > 0 and not self.CHAIN_ID_COUNTER:
             self.chain_id += 1
         else:
-            row = self.__class__.select(
-                peewee.fn.MAX(self.__class__.chain_id)).where(
-                self.CHAIN_FIELD == chain_field).scalar()
+            self.chain_id = self._next_chain_id(id_prefix)
+
+        return self._format_chain_id(id_prefix)
+
+    @classmethod
+    def _max_chain_ids(cls, id_prefixes):
+        if isinstance(cls._meta.primary_key, VerboseIDField):
+            return cls.__max_numeric_chain_ids(id_prefixes)
+
+        prefixes_by_length = collections.defaultdict(list)
+        for id_prefix in id_prefixes:
+            prefixes_by_length[len(id_prefix)].append(id_prefix)
+
+        max_chain_ids = {}
+        for length, prefixes in prefixes_by_length.items():
+            chain_prefix = peewee.fn.SUBSTR(cls.id, 1, length)
+            for batch in peewee.chunked(prefixes, cls.ID_CHECK_BATCH_SIZE):
+                max_chain_ids.update(
+                    cls.select(chain_prefix, peewee.fn.MAX(cls.chain_id)).where(
+                        functools.reduce(operator.or_, map(cls._chain_filter, batch)),
+                    ).group_by(chain_prefix).tuples(),
+                )
+
+        return {
+            id_prefix: max(max_chain_ids.get(id_prefix) or 0, 0)
+            for id_prefix in id_prefixes
+        }
+
+    @classmethod
+    def __max_numeric_chain_ids(cls, id_prefixes):
+        pk_field = cls._meta.primary_key
+        scale = 10 ** pk_field.chain_length
+        # Stored number ends with chain_id, so the division is exact on every backend
+        chain_base = (cls.id - cls.chain_id) / scale
+
+        bases = {}
+        for id_prefix in id_prefixes:
+            number = pk_field.parse(f'{id_prefix}{"0" * pk_field.chain_length}')
+            if number is not None:
+                bases[number // scale] = id_prefix
+
+        max_chain_ids = {}
+        for batch in peewee.chunked(list(bases), cls.ID_CHECK_BATCH_SIZE):
+            ranges = functools.reduce(operator.or_, (
+                cls.id.between(base * scale, base * scale + scale - 1) for base in batch
+            ))
+            for base, max_chain_id in cls.select(chain_base, peewee.fn.MAX(cls.chain_id)).where(
+                    ranges).group_by(chain_base).tuples():
+                max_chain_ids[bases[int(base)]] = max_chain_id
+
+        return {
+            id_prefix: max(max_chain_ids.get(id_prefix) or 0, 0)
+            for id_prefix in id_prefixes
+        }
+
+    @classmethod
+    def _first_chain_ids(cls, chains):
+        if not cls.CHAIN_ID_COUNTER:
+            return {
+                id_prefix: max_chain_id + 1
+                for id_prefix, max_chain_id in cls._max_chain_ids(chains).items()
+            }
+
+        first_chain_ids = {}
+        for id_prefix, chain in chains.items():
+            last_chain_id = advance_counter(
+                cls._meta.database,
+                f'{cls._meta.table_name}:{id_prefix}',
+                step=len(chain),
+                initial=functools.partial(chain[0]._max_chain_id, id_prefix),
+            )
+            first_chain_ids[id_prefix] = last_chain_id - len(chain) + 1
 
-            if not row or row.chain_id is None or row.chain_id == -1:
-                self.chain_id = 1
-            else:
-                self.chain_id = row.chain_id + 1
-        prefix = f'{self.prefix}{self.SEPARATOR}{base_id}{self.SEPARATOR}'
-        return f'{prefix}{self.chain_id:0{self.SUFFIX_LENGTH}}'
+        return first_chain_ids
+
+    @classmethod
+    def _assign_ids(cls, instances):
+        """
+        Assigns chain IDs to instances. Instances are grouped by chain, current chain_id of all
+        chains is fetched with one GROUP BY query per ID_CHECK_BATCH_SIZE chains (or from
+        counters) and consecutive chain_ids are assigned in memory. Chain parents are resolved
+        with prefetch_chain_parents.
+        """
+        cls.prefetch_chain_parents(instances)
+
+        chains = collections.defaultdict(list)
+        for instance in instances:
+            chains[instance._chain_id_prefix()].append(instance)
+
+        for id_prefix, first_chain_id in cls._first_chain_ids(chains).items():
+            for offset, instance in enumerate(chains[id_prefix]):
+                instance.chain_id = first_chain_id + offset
+                instance.id = instance._format_chain_id(id_prefix)
@@ -1,25 +1,48 @@
+import asyncio
+import collections
+import contextlib
 import functools
+import threading
 
 import peewee
 from peewee import DoesNotExist
 
+from connect.utils.peewee import aio, metrics
 from connect.utils.peewee.exceptions import (
     InvalidVerboseIdException,
     MissedChainFieldException,
     NullFieldValueException,
 )
-from connect.utils.peewee.utils import is_verbose_id
+from connect.utils.peewee.utils import verbose_id_format
+
+
+RebalanceCheckpoint = collections.namedtuple(
+    'RebalanceCheckpoint',
+    ('scope', 'phase', 'position', 'pk', 'rank', 'total', 'updated', 'spacing'),
+)
+
+# VerboseBase subclasses in order of definition, see registry.default_registry
+_verbose_models = []
 
 
 class VerboseBase(peewee.Model):
     SEPARATOR = '-'
     SUFFIX_LENGTH = 9
+    SEPARATOR_FREQUENCY = None
 
     MAX_ID_GENERATION_ITERATIONS = 10
     MAX_SAVE_ITERATIONS = 5
+    ID_CHECK_BATCH_SIZE = 500
+    BULK_INSERT_BATCH_SIZE = 100
     ITERATION_ERROR = "Couldn't generate ID."
     PRIMARY_KEY_ERROR = "At least one field should be primary key."
 
+    # Insert generated ID straight away and regenerate it on primary key conflict, instead of
+    # checking it in the table first
+    OPTIMISTIC_INSERT = False
+    # Optional generators.IDGenerator instance used by models with random verbose IDs
+    ID_GENERATOR = None
+
     # TODO: need to think about case, when you need another field as primary field
     # fix in code is applied, but need to decide how to override this field definition
     id = peewee.CharField(primary_key=True)
@@ -27,6 +50,11 @@ class VerboseBase(peewee.Model):
     class Meta:
         abstract = True
 
+    @classmethod
+    def validate_model(cls):
+        super().validate_model()
+        _verbose_models.append(cls)
+
     @property
     def prefix(self):  # pragma: no cover
         raise NotImplementedError
@@ -34,35 +62,199 @@ class VerboseBase(peewee.Model):
     def _generate_id(self, iteration=0):  # pragma: no cover
         raise NotImplementedError
 
+    def _id_format(self):
+        return verbose_id_format(
+            self.prefix,
+            self.SUFFIX_LENGTH,
+            self.SEPARATOR_FREQUENCY,
+            self.SEPARATOR,
+        )
+
+    @classmethod
+    def _requires_id_check(cls):
+        return cls.ID_GENERATOR is None or cls.ID_GENERATOR.requires_check
+
     def generate_id_with_check(self):
-        pk = self._generate_id()
+        with metrics.track(self.__class__, 'generate_id') as tracker:
+            pk = self._generate_id()
+            tracker.attempts += 1
+            if not self._requires_id_check():
+                return pk
 
-        i = 1
-        while self.__class__.select().where(self.__class__.id == pk).exists():
-            pk = self._generate_id(iteration=i)
-            i += 1
+            i = 1
+            while self.__class__.select().where(self.__class__.id == pk).exists():
+                tracker.collisions += 1
+                pk = self._generate_id(iteration=i)
+                tracker.attempts += 1
+                i += 1
 
-            if i > self.MAX_ID_GENERATION_ITERATIONS:
-                raise Exception(self.ITERATION_ERROR)
-        return pk
+                if i > self.MAX_ID_GENERATION_ITERATIONS:
+                    raise Exception(self.ITERATION_ERROR)
+            return pk
 
     def generate_id(self):
         self.id = self.generate_id_with_check()
 
-    def save(self, *args, **kwargs):
-        if not self.id:
-            kwargs.pop('force_insert', None)
-            self.generate_id()
+    @classmethod
+    def _existing_ids(cls, ids):
+        query = cls.select(cls.id).where(cls.id.in_(ids)).tuples()
+        return {row[0] for row in query}
+
+    @classmethod
+    def _find_colliding(cls, instances, taken, lock):
+        existing = cls._existing_ids([instance.id for instance in instances])
+        colliding = []
+        with lock:
+            for instance in instances:
+                if instance.id in existing or instance.id in taken:
+                    colliding.append(instance)
+                else:
+                    taken.add(instance.id)
+        return colliding
+
+    @classmethod
+    def _resolve_id_collisions(cls, instances, taken=None, lock=None):
+        taken = set() if taken is None else taken
+        lock = lock or contextlib.nullcontext()
+
+        collisions = 0
+        for batch in peewee.chunked(instances, cls.ID_CHECK_BATCH_SIZE):
+            colliding = cls._find_colliding(batch, taken, lock)
+            iteration = 1
+
+            while colliding:
+                collisions += len(colliding)
+                if iteration >= cls.MAX_ID_GENERATION_ITERATIONS:
+                    raise Exception(cls.ITERATION_ERROR)
+
+                for instance in colliding:
+                    instance.id = instance._generate_id(iteration=iteration)
+
+                colliding = cls._find_colliding(colliding, taken, lock)
+                iteration += 1
+
+        return collisions
+
+    @classmethod
+    def bulk_generate_ids(cls, model_list):
+        """
+        Generates IDs for all instances without ID. Generated IDs are checked against the table
+        with one `IN` query per ID_CHECK_BATCH_SIZE instances and only colliding IDs are
+        regenerated.
+
+        :param list model_list: model instances
+        :return: instances which got a new ID
+        :rtype: list
+        """
+        with metrics.track(cls, 'bulk_generate_ids') as tracker:
+            instances = [instance for instance in model_list if not instance.id]
+            cls._assign_ids(instances)
+            tracker.attempts += len(instances)
+
+            if cls._requires_id_check():
+                collisions = cls._resolve_id_collisions(instances)
+                tracker.attempts += collisions
+                tracker.collisions += collisions
+            return instances
+
+    @classmethod
+    def _assign_ids(cls, instances):
+        for instance in instances:
+            instance.id = instance._generate_id()
+
+    @classmethod
+    def bulk_create(cls, model_list, batch_size=None):
+        """
+        Same as peewee bulk_create, but generates missing IDs in bulk before the insert.
+        Rows are inserted with multi-row INSERTs of BULK_INSERT_BATCH_SIZE rows by default.
+        """
+        with cls._meta.database.atomic():
+            cls.bulk_generate_ids(model_list)
+            return super().bulk_create(
+                model_list,
+                batch_size=batch_size or cls.BULK_INSERT_BATCH_SIZE,
+            )
+
+    @classmethod
+    def _is_primary_key_conflict(cls, error):
+        message = str(getattr(error, 'orig', None) or error)
+        column = cls._meta.primary_key.column_name
+
+        return any(marker in message for marker in (
+            f'UNIQUE constraint failed: {cls._meta.table_name}.{column}',  # SQLite
+            f'Key ({column})=',  # PostgreSQL
+            "PRIMARY'",  # MySQL
+        ))
+
+    def _save_optimistic(self, tracker, *args):
+        for iteration in range(self.MAX_SAVE_ITERATIONS):
+            self.id = self._generate_id(iteration=iteration)
+            tracker.attempts += 1
             try:
-                return super().save(*args, force_insert=True)
+                with self._meta.database.atomic():
+                    return super().save(*args, force_insert=True)
             except peewee.IntegrityError as e:
-                if '(id)=' not in str(e.orig):
+                if not self._is_primary_key_conflict(e):
+                    self.id = None
                     raise e
-                else:
-                    raise Exception(
-                        f'Cannot generate ID after {self.MAX_PK_ITERATIONS} iterations.')
+                tracker.collisions += 1
+
+        self.id = None
+        raise Exception(f'Cannot generate ID after {self.MAX_SAVE_ITERATIONS} iterations.')
+
+    def _insert(self, tracker, *args):
+        if self.OPTIMISTIC_INSERT:
+            return self._save_optimistic(tracker, *args)
+
+        self.generate_id()
+        try:
+            return super().save(*args, force_insert=True)
+        except peewee.IntegrityError as e:
+            self.id = None
+            if not self._is_primary_key_conflict(e):
+                raise e
+            else:
+                tracker.collisions += 1
+                raise Exception(self.ITERATION_ERROR)
+
+    def save(self, *args, **kwargs):
+        if not self.id:
+            kwargs.pop('force_insert', None)
+            with metrics.track(self.__class__, 'save') as tracker:
+                return self._insert(tracker, *args)
         return super().save(*args, **kwargs)
 
+    async def agenerate_id(self):
+        """
+        Same as generate_id, but ID checks run in the bounded executor of `aio` module.
+        """
+        return await aio.run_sync(self._meta.database, self.generate_id)
+
+    async def asave(self, *args, **kwargs):
+        """
+        Same as save, but runs in the bounded executor of `aio` module.
+        """
+        return await aio.run_sync(self._meta.database, self.save, *args, **kwargs)
+
+    @classmethod
+    async def abulk_create(cls, model_list, batch_size=None):
+        """
+        Same as bulk_create, but runs in the bounded executor of `aio` module. Collision checks
+        of ID_CHECK_BATCH_SIZE batches are independent, so they run concurrently.
+        """
+        database = cls._meta.database
+        instances = [instance for instance in model_list if not instance.id]
+        await aio.run_sync(database, cls._assign_ids, instances)
+
+        if cls._requires_id_check():
+            taken, lock = set(), threading.Lock()
+            await asyncio.gather(*(
+                aio.run_sync(database, cls._resolve_id_collisions, batch, taken, lock)
+                for batch in peewee.chunked(instances, cls.ID_CHECK_BATCH_SIZE)
+            ))
+
+        return await aio.run_sync(database, cls.bulk_create, model_list, batch_size)
+
 
 class TransactionalIDBase(VerboseBase):
     SUFFIX_LENGTH = 3
@@ -73,13 +265,14 @@ class TransactionalIDBase(VerboseBase):
         abstract = True
 
     def _get_base_id(self, chain_field):
-        chain_prefix_length = len(chain_field.prefix + self.SEPARATOR)
-        if is_verbose_id(chain_field.prefix, chain_field.SEPARATOR, chain_field.id):
-            return chain_field.id[chain_prefix_length:]
+        id_format = chain_field._id_format()
+        base_id = id_format.base_id(chain_field.id)
+        if base_id is not None:
+            return base_id
         elif self.SAFE_GENERATE:
             raise InvalidVerboseIdException(chain_field.id)
         else:
-            return chain_field.generate_id_with_check()[chain_prefix_length:]
+            return id_format.base_id(chain_field.generate_id_with_check())
 
     def _rgetattr(self, attr):
 
@@ -91,13 +284,502 @@ class TransactionalIDBase(VerboseBase):
 
         return functools.reduce(_getattr, attr, self)
 
+    @classmethod
+    def _chain_path(cls):
+        path, model = [], cls
+        for name in cls.CHAIN_FIELD.split('__'):
+            field = model._meta.fields.get(name)
+            if not isinstance(field, peewee.ForeignKeyField):
+                return None
+
+            path.append(field)
+            model = field.rel_model
+
+        if not issubclass(model, VerboseBase) or path[-1].rel_field is not model._meta.primary_key:
+            return None
+        return path
+
+    @classmethod
+    def _resolve_chain_parent_ids(cls, path, first_ids):
+        first_key = path[0].rel_field
+        query = first_key.model.select(first_key, path[-1])
+        for field in path[1:-1]:
+            query = query.join(field.rel_model, on=(field == field.rel_field))
+
+        parent_ids = {}
+        for batch in peewee.chunked(first_ids, cls.ID_CHECK_BATCH_SIZE):
+            parent_ids.update(query.where(first_key.in_(batch)).tuples())
+        return parent_ids
+
+    @classmethod
+    def prefetch_chain_parents(cls, instances):
+        """
+        Resolves chain parent IDs of instances with multi hop CHAIN_FIELD (f.e. 'asset__product')
+        with one JOINed query per ID_CHECK_BATCH_SIZE instances. Single hop chains are resolved
+        from the foreign key value and do not need prefetching.
+
+        :param list instances: model instances
+        """
+        path = cls._chain_path()
+        if path is None or len(path) == 1:
+            return
+
+        first_ids = {instance.__data__.get(path[0].name) for instance in instances} - {None}
+        parent_ids = cls._resolve_chain_parent_ids(path, list(first_ids))
+        for instance in instances:
+            first_id = instance.__data__.get(path[0].name)
+            instance._chain_parent_cache = (first_id, parent_ids.get(first_id))
+
+    def _chain_parent_id(self, path):
+        first_id = self.__data__.get(path[0].name)
+        if first_id is None or len(path) == 1:
+            return first_id
+
+        cached = getattr(self, '_chain_parent_cache', None)
+        if cached is None or cached[0] != first_id:
+            parent_ids = self._resolve_chain_parent_ids(path, [first_id])
+            cached = self._chain_parent_cache = (first_id, parent_ids.get(first_id))
+        return cached[1]
+
+    def _chain_parent(self):
+        # Parent with only ID set, so its verbose ID base is taken without loading related rows.
+        # None means, that parent has to be loaded (f.e. it has non verbose ID).
+        path = self._chain_path()
+        if path is None:
+            return None
+
+        parent_id = self._chain_parent_id(path)
+        if parent_id is None:
+            return None
+
+        parent_model = path[-1].rel_model
+        parent = parent_model(**{parent_model._meta.primary_key.name: parent_id})
+        if parent._id_format().base_id(parent_id) is None:
+            return None
+        return parent
+
     def _validate_chain_field(self):
         if self.CHAIN_FIELD is None:
             raise MissedChainFieldException(self.__class__)
 
-        chain_field_value = self._rgetattr(self.CHAIN_FIELD.split('__'))
+        chain_field_value = self._chain_parent()
+        if chain_field_value is None:
+            chain_field_value = self._rgetattr(self.CHAIN_FIELD.split('__'))
 
         if chain_field_value is None:
             raise NullFieldValueException(self.CHAIN_FIELD)
 
         return chain_field_value
+
+
+class OrderedBase(peewee.Model):
+    """
+    Base for ordered models with 'position' field. Objects are ordered within the scope defined
+    by ORDER_SCOPE - names of fields, which values should be equal for all objects in one
+    ordered list. Composite (scope fields, position) index is added for scoped models.
+    """
+    ORDER_SCOPE = ()
+    REORDER_BATCH_SIZE = 500
+    REBALANCE_BATCH_SIZE = 1000
+    STREAM_BATCH_SIZE = 1000
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def validate_model(cls):
+        super().validate_model()
+
+        if not cls.ORDER_SCOPE or 'position' not in cls._meta.fields:
+            return
+
+        index_fields = (*cls.ORDER_SCOPE, 'position')
+        if all(tuple(fields) != index_fields for fields, _ in cls._meta.indexes):
+            cls._meta.indexes = [*cls._meta.indexes, (index_fields, False)]
+
+    def _scope_expressions(self):
+        expressions = []
+        for name in self.ORDER_SCOPE:
+            field = self._meta.fields[name]
+            value = self.__data__.get(name)
+            expressions.append(field.is_null() if value is None else field == value)
+
+        return expressions
+
+    def _scope_filter(self, query):
+        expressions = self._scope_expressions()
+        return query.where(*expressions) if expressions else query
+
+    def _scope_key(self):
+        return tuple(self.__data__.get(name) for name in self.ORDER_SCOPE)
+
+    def _max_position(self):
+        return self._scope_filter(
+            self.__class__.select(peewee.fn.MAX(self.__class__.position))).scalar()
+
+    def _in_same_scope(self, other):
+        return all(
+            self.__data__.get(name) == other.__data__.get(name) for name in self.ORDER_SCOPE
+        )
+
+    def _ordered(self, fields=(), descending=False):
+        _, order_by = self._keyset((), descending)
+        return self._scope_filter(self.__class__.select(*fields)).order_by(*order_by)
+
+    @property
+    def last_element(self):
+        return self._ordered(descending=True).first()
+
+    @property
+    def first_element(self):
+        return self._ordered().first()
+
+    @property
+    def next_element(self):
+        return self._ordered().where(
+            self._beyond_cursor((self.position, self._pk))).first()
+
+    @property
+    def previous_element(self):
+        return self._ordered(descending=True).where(
+            self._beyond_cursor((self.position, self._pk), descending=True)).first()
+
+    def rank(self):
+        """
+        :return: 0-based index of the object in its ordered list
+        :rtype: int
+        """
+        return self._scope_filter(self.__class__.select().where(
+            self._beyond_cursor((self.position, self._pk), descending=True))).count()
+
+    @classmethod
+    def _keyset(cls, fields, descending=False):
+        pk_field = cls._meta.primary_key
+        if fields:
+            # Scope fields are needed by _scope_filter of the returned objects
+            scope_fields = (cls._meta.fields[name] for name in cls.ORDER_SCOPE)
+            fields = (*fields, *scope_fields, cls.position, pk_field)
+        if descending:
+            return fields, (cls.position.desc(), pk_field.desc())
+        return fields, (cls.position.asc(), pk_field.asc())
+
+    @classmethod
+    def _beyond_cursor(cls, cursor, descending=False, inclusive=False):
+        # The leading range on position keeps the condition on the position index
+        position, pk = cursor
+        pk_field = cls._meta.primary_key
+        if descending:
+            pk_beyond = pk_field <= pk if inclusive else pk_field < pk
+            return (cls.position <= position) & ((cls.position < position) | pk_beyond)
+
+        pk_beyond = pk_field >= pk if inclusive else pk_field > pk
+        return (cls.position >= position) & ((cls.position > position) | pk_beyond)
+
+    @classmethod
+    def page_after(cls, cursor=None, limit=20, scope=None, fields=()):
+        """
+        Keyset page of objects following the cursor, uses (scope, position) index instead of
+        OFFSET scan. Objects are ordered by (position, primary key), so objects sharing a
+        position are not skipped.
+
+        :param tuple cursor: (position, primary key) returned with the previous page, first
+            page if None
+        :param int limit: page size
+        :param dict scope: ORDER_SCOPE values of the list
+        :param fields: selected fields, all by default, scope fields, position and primary key
+            are added
+        :return: objects in order of positions and cursor of the next page
+        :rtype: tuple
+        """
+        fields, order_by = cls._keyset(fields)
+        query = cls(**(scope or {}))._scope_filter(cls.select(*fields)).order_by(*order_by)
+        if cursor is not None:
+            query = query.where(cls._beyond_cursor(cursor))
+
+        objects = list(query.limit(limit))
+        return objects, (objects[-1].position, objects[-1]._pk) if objects else cursor
+
+    @classmethod
+    def page_before(cls, cursor, limit=20, scope=None, fields=()):
+        """
+        Keyset page of objects preceding the cursor, see page_after.
+
+        :param tuple cursor: (position, primary key) of the first object of the next page
+        :return: objects in order of positions and cursor of the previous page
+        :rtype: tuple
+        """
+        fields, order_by = cls._keyset(fields, descending=True)
+        query = cls(**(scope or {}))._scope_filter(cls.select(*fields)).where(
+            cls._beyond_cursor(cursor, descending=True)).order_by(*order_by)
+
+        objects = list(query.limit(limit))[::-1]
+        return objects, (objects[0].position, objects[0]._pk) if objects else cursor
+
+    @classmethod
+    def item_at(cls, index, scope=None, fields=()):
+        """
+        Object at the index of the ordered list, negative index counts from the end. The index
+        is walked with OFFSET over the (scope, position) index, so prefer page_after for
+        iteration.
+
+        :param int index: 0-based index
+        :param dict scope: ORDER_SCOPE values of the list
+        :param fields: selected fields, all by default, scope fields, position and primary key
+            are added
+        :return: object or None if index is out of the list
+        """
+        owner = cls(**(scope or {}))
+        fields, _ = cls._keyset(fields)
+        if index < 0:
+            return owner._ordered(fields, descending=True).offset(-index - 1).first()
+
+        return owner._ordered(fields).offset(index).first()
+
+    @classmethod
+    def _scope_owners(cls, scope=None):
+        if scope is not None:
+            return [cls(**scope)]
+        elif not cls.ORDER_SCOPE:
+            return [cls()]
+
+        fields = [cls._meta.fields[name] for name in cls.ORDER_SCOPE]
+        return [
+            cls(**dict(zip(cls.ORDER_SCOPE, values)))
+            for values in cls.select(*fields).distinct().order_by(*fields).tuples()
+        ]
+
+    def _neighbour(self, cursor=None, is_next=True):
+        """
+        :param tuple cursor: (position, primary key), the first object is returned if None
+        :return: (position, primary key) of the closest other object beyond the cursor or None
+        """
+        cls = self.__class__
+        pk_field = cls._meta.primary_key
+        _, order_by = cls._keyset((), descending=not is_next)
+
+        query = self._scope_filter(cls.select(cls.position, pk_field).where(pk_field != self._pk))
+        if cursor is not None:
+            query = query.where(cls._beyond_cursor(cursor, descending=not is_next))
+        else:
+            query = query.where(cls.position.is_null(False))
+
+        rows = list(query.order_by(*order_by).limit(1).tuples())
+        return rows[0] if rows else None
+
+    def _neighbours(self, after=None, before=None):
+        """
+        :return: (position, primary key) cursors of the objects, between which the object is
+            placed by sort(after, before), None for the start or the end of the list
+        """
+        if before:
+            upper = (before.position, before._pk)
+            return self._neighbour(upper, is_next=False), upper
+
+        lower = (after.position, after._pk) if after else None
+        return lower, self._neighbour(lower)
+
+    @classmethod
+    def _update_positions(cls, positions):
+        pk_field = cls._meta.primary_key
+
+        updated = 0
+        for batch in peewee.chunked(list(positions.items()), cls.REORDER_BATCH_SIZE):
+            position = peewee.Case(
+                pk_field,
+                [(pk_field.to_value(pk), position) for pk, position in batch],
+            )
+            updated += cls.update(position=position).where(
+                pk_field.in_([pk for pk, _ in batch])).execute()
+
+        return updated
+
+    @classmethod
+    def _rebalance_spacing(cls, owner, low, high, total):  # pragma: no cover
+        """
+        :return: spacing of rebalanced positions, passed to _rebalance_target
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def _rebalance_target(cls, spacing, rank):  # pragma: no cover
+        """
+        :return: rebalanced position of the object with the rank (index within the range)
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def __rebalance_chunk(cls, owner, region, checkpoint, size):
+        pk_field = cls._meta.primary_key
+        is_down = checkpoint.phase == 'down'
+
+        query = owner._scope_filter(cls.select(pk_field, cls.position).where(*region))
+        if checkpoint.pk is not None and is_down:
+            query = query.where((cls.position > checkpoint.position) | (
+                (cls.position == checkpoint.position) & (pk_field > checkpoint.pk)))
+        elif checkpoint.pk is not None:
+            query = query.where((cls.position < checkpoint.position) | (
+                (cls.position == checkpoint.position) & (pk_field < checkpoint.pk)))
+
+        order_by = (cls.position.asc(), pk_field.asc())
+        if not is_down:
+            order_by = (cls.position.desc(), pk_field.desc())
+
+        with cls._meta.database.atomic():
+            rows = list(query.order_by(*order_by).limit(size).tuples())
+
+            positions = {}
+            rank = checkpoint.rank
+            for pk, position in rows:
+                target = cls._rebalance_target(checkpoint.spacing, rank)
+                if target < position if is_down else target > position:
+                    positions[pk] = target
+                rank += 1 if is_down else -1
+
+            updated = checkpoint.updated + cls._update_positions(positions)
+
+        if len(rows) == size:
+            return checkpoint._replace(
+                position=rows[-1][1], pk=rows[-1][0], rank=rank, updated=updated)
+        elif is_down:
+            return checkpoint._replace(
+                phase='up', position=None, pk=None, rank=checkpoint.total - 1, updated=updated)
+
+        return checkpoint._replace(phase='done', position=None, pk=None, updated=updated)
+
+    @classmethod
+    def iter_rebalance(cls, scope=None, low=None, high=None, chunk_size=None, checkpoint=None):
+        """
+        Renumbers positions back to even spacing in chunks, each chunk is updated in its own
+        transaction. Objects moving down are updated in ascending order first, then objects
+        moving up in descending order, so relative order is kept after every chunk and chunks
+        can be read with keyset queries over the rewritten positions. With low/high only objects
+        within this positions range are renumbered, evenly between the closest objects outside
+        of the range.
+
+            :param scope: dict of ORDER_SCOPE values, all scopes are rebalanced by default
+            :param low: lowest position of the range
+            :param high: highest position of the range
+            :param chunk_size: number of objects updated in one transaction
+            :param checkpoint: RebalanceCheckpoint to resume from
+            :return: generator of RebalanceCheckpoint after every chunk
+        """
+        chunk_size = chunk_size or cls.REBALANCE_BATCH_SIZE
+        region = [cls.position.is_null(False)]
+        if low is not None:
+            region.append(cls.position >= low)
+        if high is not None:
+            region.append(cls.position <= high)
+
+        for owner in cls._scope_owners(scope):
+            if checkpoint is not None and checkpoint.scope != owner._scope_key():
+                continue
+            elif checkpoint is None:
+                total = owner._scope_filter(cls.select().where(*region)).count()
+                # Spacing is kept in the checkpoint, as moved objects change the range neighbours
+                spacing = cls._rebalance_spacing(owner, low, high, total)
+                checkpoint = RebalanceCheckpoint(
+                    owner._scope_key(), 'down', None, None, 0, total, 0, spacing)
+
+            while checkpoint.phase != 'done':
+                checkpoint = cls.__rebalance_chunk(owner, region, checkpoint, chunk_size)
+                yield checkpoint
+
+            checkpoint = None
+
+    @classmethod
+    def rebalance(cls, scope=None, low=None, high=None, chunk_size=None, checkpoint=None):
+        """
+        Runs iter_rebalance to the end, see iter_rebalance for parameters.
+
+            :return: number of updated objects
+        """
+        with metrics.track(cls, 'rebalance') as tracker:
+            updated = tracker.rows = sum(
+                state.updated
+                for state in cls.iter_rebalance(scope, low, high, chunk_size, checkpoint)
+                if state.phase == 'done'
+            )
+            return updated
+
+    @classmethod
+    def export_chunks(cls, scope=None, chunk_size=None, fields=()):
+        """
+        Streams objects of one ordered list in position order as lists of dicts. Chunks are
+        read with keyset queries over (position, primary key), so memory does not depend on
+        the list size. Objects appended after the export started and objects without position
+        are not exported.
+
+        :param dict scope: ORDER_SCOPE values of the list
+        :param int chunk_size: number of objects in a chunk, STREAM_BATCH_SIZE by default
+        :param fields: exported fields, all by default, scope fields, position and primary key
+            are added
+        :return: generator of chunks
+        """
+        owner = cls(**(scope or {}))
+        pk_name = cls._meta.primary_key.name
+        chunk_size = chunk_size or cls.STREAM_BATCH_SIZE
+        fields, order_by = cls._keyset(fields)
+
+        high = owner._max_position()
+        if high is None:
+            return
+
+        query = owner._scope_filter(cls.select(*fields)).where(cls.position <= high).order_by(
+            *order_by)
+        cursor = None
+        while True:
+            page = query if cursor is None else query.where(cls._beyond_cursor(cursor))
+
+            rows = list(page.limit(chunk_size).dicts())
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+
+            cursor = rows[-1]['position'], rows[-1][pk_name]
+
+    @classmethod
+    def import_chunks(cls, chunks, overrides=None, keep_ids=False, batch_size=100):
+        """
+        Appends streamed objects (see export_chunks) to the end of their lists. Each chunk is
+        inserted with bulk_create in its own transaction: IDs are generated in bulk and evenly
+        spaced positions are assigned after the current tail with one lookup per scope.
+
+        Examples:
+            Item.import_chunks(Item.export_chunks(scope={'tenant': 'a'}), {'tenant': 'b'})
+
+        :param chunks: iterable of lists of dicts
+        :param dict overrides: values set on all imported objects, f.e. the target scope
+        :param bool keep_ids: insert passed primary keys instead of generating new ones
+        :param int batch_size: number of objects in one INSERT
+        :return: number of imported objects
+        :rtype: int
+        """
+        pk_name = cls._meta.primary_key.name
+        imported = 0
+        for rows in chunks:
+            instances = []
+            for row in rows:
+                data = {**row, **(overrides or {}), 'position': None}
+                if not keep_ids:
+                    data.pop(pk_name, None)
+                instances.append(cls(**data))
+
+            with cls._meta.database.atomic():
+                cls.assign_tail_positions(instances)
+                cls.bulk_create(instances, batch_size=batch_size)
+            imported += len(instances)
+
+        return imported
+
+    async def asave(self, *args, **kwargs):
+        """
+        Same as save, but runs in the bounded executor of `aio` module.
+        """
+        return await aio.run_sync(self._meta.database, self.save, *args, **kwargs)
+
+    async def asort(self, after=None, before=None):
+        """
+        Same as sort, but runs in the bounded executor of `aio` module.
+        """
+        return await aio.run_sync(self._meta.database, self.sort, after=after, before=before)
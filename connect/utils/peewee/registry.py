@@ -0,0 +1,178 @@
+import collections
+
+import peewee
+
+from connect.utils.peewee.exceptions import AmbiguousPrefixException
+from connect.utils.peewee.models import _verbose_models
+
+
+_MODELS = object()
+
+_default_registry = (None, None)
+_explicit_models = []
+
+
+class PrefixRegistry:
+    """
+    Maps verbose IDs to models by the longest registered prefix. Prefixes are stored with the
+    model separator in a trie, so prefixes containing the separator ('TEST' and 'TEST-ORD')
+    are resolved correctly.
+
+    Examples:
+        registry = PrefixRegistry([Product, Asset, Request])
+        registry.resolve('PRD-123-456-789')  # Product
+        registry.fetch(['AS-123-456-789', 'PRD-123-456-789'])  # [<Asset>, <Product>]
+
+    When several models are registered for one prefix, explicitly registered models are preferred
+    to automatically registered ones, and a subclass is preferred to its base models.
+    """
+    def __init__(self, models=()):
+        self._root = {}
+        for model in models:
+            self.register(model)
+
+    def register(self, model, prefix=None, explicit=True):
+        """
+        :param model: VerboseBase subclass
+        :param prefix: str: model prefix, taken from a model instance if not passed
+        :param bool explicit: if model takes precedence over not explicit models with the prefix
+        """
+        if prefix is None:
+            prefix = model().prefix
+
+        node = self._root
+        for char in f'{prefix}{model.SEPARATOR}':
+            node = node.setdefault(char, {})
+
+        models = node.setdefault(_MODELS, {})
+        models[model] = models.get(model, False) or explicit
+
+    def resolve(self, id_value):
+        """
+        :param str id_value: verbose id
+        :return: model with the longest prefix of the id or None
+        :raises AmbiguousPrefixException: if the prefix is registered for several unrelated models
+        """
+        node, models, length = self._root, None, 0
+        for index, char in enumerate(id_value):
+            node = node.get(char)
+            if node is None:
+                break
+            if _MODELS in node:
+                models, length = node[_MODELS], index + 1
+
+        if models is None:
+            return None
+
+        candidates = [model for model, explicit in models.items() if explicit] or list(models)
+        candidates = [
+            model for model in candidates
+            if not any(other is not model and issubclass(other, model) for other in candidates)
+        ]
+        if len(candidates) > 1:
+            raise AmbiguousPrefixException(id_value[:length], candidates)
+
+        return candidates[0]
+
+    def group(self, ids):
+        """
+        Groups ids by model, keeping order of ids inside groups. Unknown ids are grouped
+        under None.
+
+        :param iterable ids: verbose ids
+        :return: ids by model
+        :rtype: dict
+        """
+        groups = collections.defaultdict(list)
+        for id_value in ids:
+            groups[self.resolve(id_value)].append(id_value)
+
+        return dict(groups)
+
+    def fetch(self, ids):
+        """
+        Fetches objects for mixed verbose ids with one `IN` query per model (per
+        ID_CHECK_BATCH_SIZE ids).
+
+        :param iterable ids: verbose ids
+        :return: objects in order of ids, None for unknown or missing ids
+        :rtype: list
+        """
+        ids = list(ids)
+        found = {}
+        for model, model_ids in self.group(ids).items():
+            if model is None:
+                continue
+
+            pk_field = model._meta.primary_key
+            for batch in peewee.chunked(dict.fromkeys(model_ids), model.ID_CHECK_BATCH_SIZE):
+                found.update(
+                    (instance._pk, instance)
+                    for instance in model.select().where(pk_field.in_(batch))
+                )
+
+        return [found.get(id_value) for id_value in ids]
+
+
+def _build_registry(models):
+    registry = PrefixRegistry()
+    for model in models:
+        try:
+            prefix = model().prefix
+        except Exception:
+            continue
+
+        if isinstance(prefix, str):
+            registry.register(model, prefix, explicit=False)
+
+    for model, prefix in _explicit_models:
+        registry.register(model, prefix)
+
+    return registry
+
+
+def register_model(model, prefix=None):
+    """
+    Register model in the default registry explicitly, it is preferred to other models with the
+    same prefix. Use it for models which prefix can not be taken from an empty instance.
+
+    :param model: VerboseBase subclass
+    :param prefix: str: model prefix, taken from a model instance if not passed
+    """
+    global _default_registry
+
+    _explicit_models.append((model, prefix))
+    _default_registry = (None, None)
+
+
+def default_registry():
+    """
+    Registry of all defined VerboseBase subclasses with static prefix and models passed to
+    register_model. Models, which prefix can not be taken from an empty instance, are skipped.
+    The registry is rebuilt only when new models are defined or registered.
+
+    :rtype: PrefixRegistry
+    """
+    global _default_registry
+
+    key = len(_verbose_models)
+    cached_key, registry = _default_registry
+    if key != cached_key:
+        registry = _build_registry(dict.fromkeys(_verbose_models))
+        _default_registry = (key, registry)
+
+    return registry
+
+
+def resolve_model(id_value):
+    """
+    Resolve verbose id with the default registry, see PrefixRegistry.resolve
+    """
+    return default_registry().resolve(id_value)
+
+
+def fetch_many(ids):
+    """
+    Fetch mixed verbose ids with the default registry, see PrefixRegistry.fetch
+    """
+    return default_registry().fetch(ids)
@@ -1,16 +1,108 @@
+import functools
 import random
-from textwrap import wrap
+import re
 
 
-def _wrap_id(suffix_length, separator_frequency, separator, id_sequence):
-    if separator_frequency is None:
-        separator_frequency = 4 if suffix_length % 4 == 0 else 3
-    return f"{separator}".join(wrap(id_sequence, separator_frequency))
+class VerboseIDFormat:
+    """
+    Compiled verbose ID format. Chunk boundaries of the numeric suffix, ID head (prefix with
+    separator) and validation regex are computed once, so formatting an ID is string slicing.
+    Use verbose_id_format to get cached instances.
+    """
+    # Extra random bits per value, which keep modulo bias of generate_many negligible
+    BIAS_BITS = 32
+
+    def __init__(self, prefix, suffix_length, separator_frequency, separator):
+        if separator_frequency is None:
+            separator_frequency = 4 if suffix_length % 4 == 0 else 3
+
+        self.prefix = prefix
+        self.suffix_length = suffix_length
+        self.separator_frequency = separator_frequency
+        self.separator = separator
+        self.head = f'{prefix}{separator}'
+        self.slices = self._slices(suffix_length)
+        self.regex = re.compile(
+            re.escape(self.head) + re.escape(separator).join(
+                f'\\d{{{chunk.stop - chunk.start}}}' for chunk in self.slices
+            ),
+        )
+
+    def _slices(self, length):
+        frequency = self.separator_frequency
+        return tuple(
+            slice(start, min(start + frequency, length))
+            for start in range(0, length, frequency)
+        )
+
+    def render(self, sequence):
+        """
+        :param str sequence: numeric suffix
+        :return: verbose id
+        :rtype: str
+        """
+        slices = self.slices if len(sequence) == self.suffix_length else self._slices(
+            len(sequence),
+        )
+        return self.head + self.separator.join([sequence[chunk] for chunk in slices])
+
+    def generate(self):
+        return self.render(random_numeric_string_sequence(self.suffix_length))
+
+    def generate_many(self, count):
+        """
+        Generate `count` random verbose ids from a single batch of random bits
+
+        :param int count: number of ids
+        :return: verbose ids, which may repeat like ids from `generate`
+        :rtype: list
+        """
+        if count <= 0:
+            return []
+        if self.suffix_length <= 0:
+            return [self.head] * count
+
+        low = 10 ** (self.suffix_length - 1)
+        space = id_space_size(self.suffix_length)
+        width = (space.bit_length() + self.BIAS_BITS + 7) // 8
+        data = random.getrandbits(8 * width * count).to_bytes(width * count, 'little')
+
+        return [
+            self.render(str(low + int.from_bytes(data[offset:offset + width], 'little') % space))
+            for offset in range(0, width * count, width)
+        ]
 
+    def is_valid(self, id_value):
+        """
+        :param str id_value: checked value
+        :return: if value has exactly this format
+        :rtype: bool
+        """
+        return self.regex.fullmatch(id_value) is not None
 
-def _template_verbose_id(prefix, separator, verbose_id):
-    return '{name}{separator}{id}'.format(
-        name=prefix, separator=separator, id=verbose_id)
+    def base_id(self, id_value):
+        """
+        :param str id_value: verbose id
+        :return: id without prefix and separator or None if id has a different prefix
+        :rtype: str
+        """
+        if id_value.startswith(self.head):
+            return id_value[len(self.head):]
+
+
+@functools.lru_cache(maxsize=None)
+def verbose_id_format(prefix, suffix_length, separator_frequency, separator):
+    """
+    Return cached VerboseIDFormat for passed format parameters
+
+    :param prefix: str: verbose id prefix
+    :param suffix_length: int: verbose id suffix length
+    :param separator_frequency: int: number of digits in one chunk, 3 or 4 if None
+    :param separator: str: verbose id separator
+    :return: compiled format
+    :rtype: VerboseIDFormat
+    """
+    return VerboseIDFormat(prefix, suffix_length, separator_frequency, separator)
 
 
 def _generate_verbose_id(
@@ -20,10 +112,9 @@ def _generate_verbose_id(
     separator,
     id_sequence,
 ):
-    _wrapped_id = _wrap_id(
-        suffix_length, separator_frequency, separator, id_sequence)
-
-    return _template_verbose_id(prefix, separator, _wrapped_id)
+    return verbose_id_format(
+        prefix, suffix_length, separator_frequency, separator,
+    ).render(id_sequence)
 
 
 def generate_verbose_id(
@@ -43,13 +134,7 @@ def generate_verbose_id(
     :return: verbose id
     :rtype: str
     """
-    return _generate_verbose_id(
-        prefix,
-        suffix_length,
-        separator_frequency,
-        separator,
-        random_numeric_string_sequence(suffix_length),
-    )
+    return verbose_id_format(prefix, suffix_length, separator_frequency, separator).generate()
 
 
 def random_numeric_string_sequence(length):
@@ -69,6 +154,71 @@ def random_numeric_string_sequence(length):
     )
 
 
+def id_space_size(length):
+    """
+    Number of values which can be generated by random_numeric_string_sequence
+
+    :param length: int: numeric string length
+    :return: number of possible values
+    :rtype: int
+    """
+    if length <= 0:
+        return 0
+
+    return 9 * 10**(length - 1)
+
+
+def collision_probability(rows, space):
+    """
+    Probability that a random value is already taken
+
+    :param rows: int: number of taken values
+    :param space: int: number of possible values
+    :return: collision probability
+    :rtype: float
+    """
+    if space <= 0:
+        return 1.0
+
+    return min(rows / space, 1.0)
+
+
+def expected_retries(rows, space):
+    """
+    Expected number of regenerations before a free random value is found
+
+    :param rows: int: number of taken values
+    :param space: int: number of possible values
+    :return: expected number of retries, inf if all values are taken
+    :rtype: float
+    """
+    probability = collision_probability(rows, space)
+    if probability >= 1:
+        return float('inf')
+
+    return probability / (1 - probability)
+
+
+def recommend_suffix_length(rows, max_collision_probability):
+    """
+    Shortest random numeric suffix, which keeps collision probability with `rows` taken values
+    at or below `max_collision_probability`
+
+    :param rows: int: expected number of rows
+    :param max_collision_probability: float: acceptable collision probability
+    :return: suffix length
+    :rtype: int
+    """
+    if max_collision_probability <= 0:
+        raise ValueError('Collision probability should be positive.')
+
+    length = 1
+    while collision_probability(rows, id_space_size(length)) > max_collision_probability:
+        length += 1
+
+    return length
+
+
 def is_verbose_id(prefix, separator, id_value):
     """
     Check if passed value is verbose id value with particular prefix
@@ -80,3 +230,104 @@ def is_verbose_id(prefix, separator, id_value):
     :rtype: bool
     """
     return id_value.startswith(f'{prefix}{separator}')
+
+
+RANK_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+# Appended ranks increment the leading RANK_APPEND_WIDTH digits by RANK_APPEND_STEP
+RANK_APPEND_WIDTH = 6
+RANK_APPEND_STEP = len(RANK_DIGITS) ** 2
+
+
+def _rank_midpoint(lower, upper):
+    if upper is not None:
+        common = 0
+        while common < len(upper) and (
+            lower[common] if common < len(lower) else RANK_DIGITS[0]
+        ) == upper[common]:
+            common += 1
+
+        if common > 0:
+            return upper[:common] + _rank_midpoint(lower[common:], upper[common:])
+
+    lower_digit = RANK_DIGITS.index(lower[0]) if lower else 0
+    upper_digit = RANK_DIGITS.index(upper[0]) if upper is not None else len(RANK_DIGITS)
+
+    if upper_digit - lower_digit > 1:
+        return RANK_DIGITS[(lower_digit + upper_digit) // 2]
+    elif upper is not None and len(upper) > 1:
+        return upper[:1]
+
+    return RANK_DIGITS[lower_digit] + _rank_midpoint(lower[1:], None)
+
+
+def rank_between(lower, upper):
+    """
+    Generate string rank which is sorted between passed ranks. Ranks consist of RANK_DIGITS and
+    never end with the first digit, so there is always a rank before any other rank.
+
+    :param lower: str: lower rank, None if there is no lower bound
+    :param upper: str: upper rank, None if there is no upper bound
+    :return: rank between lower and upper ranks
+    :rtype: str
+    """
+    if lower is not None and upper is not None and lower >= upper:
+        raise ValueError(f'Rank {lower} should be lower than {upper}.')
+
+    return _rank_midpoint(lower or '', upper)
+
+
+def _rank_value(rank):
+    base = len(RANK_DIGITS)
+    value = 0
+    for digit in rank:
+        value = value * base + RANK_DIGITS.index(digit)
+    return value
+
+
+def _rank_digits(value, width):
+    base = len(RANK_DIGITS)
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, base)
+        digits.append(RANK_DIGITS[digit])
+    return ''.join(reversed(digits))
+
+
+def rank_after(lower):
+    """
+    Generate rank for appending after the passed rank. Leading RANK_APPEND_WIDTH digits of the
+    rank are incremented by RANK_APPEND_STEP, so appended ranks keep a fixed length and leave
+    space for inserts between them. The rank is widened only when the leading digits overflow.
+
+    :param lower: str: last rank, None if there are no ranks
+    :return: rank after lower
+    :rtype: str
+    """
+    if not lower:
+        return rank_between(None, None)
+
+    head = lower[:RANK_APPEND_WIDTH].ljust(RANK_APPEND_WIDTH, RANK_DIGITS[0])
+    value = _rank_value(head) + RANK_APPEND_STEP
+    if value >= len(RANK_DIGITS) ** RANK_APPEND_WIDTH:
+        return head + rank_after(lower[RANK_APPEND_WIDTH:])
+
+    return _rank_digits(value, RANK_APPEND_WIDTH).rstrip(RANK_DIGITS[0])
+
+
+def spaced_rank(index, count):
+    """
+    Generate rank with passed index from count evenly spaced ranks, there are at least
+    len(RANK_DIGITS) free ranks of the same length between two consecutive ranks.
+
+    :param index: int: rank index, starting from 0
+    :param count: int: number of ranks
+    :return: rank
+    :rtype: str
+    """
+    base = len(RANK_DIGITS)
+    width = 1
+    while base**width < (count + 1) * base:
+        width += 1
+
+    value = (index + 1) * base**width // (count + 1)
+    return _rank_digits(value, width).rstrip(RANK_DIGITS[0])
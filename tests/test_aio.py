@@ -0,0 +1,131 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import peewee
+import pytest
+
+from connect.utils.peewee import aio
+from connect.utils.peewee.mixins import OrderedModelMixin, TransactionalIDMixin, VerboseIDMixin
+from connect.utils.peewee.utils import VerboseIDFormat
+
+
+class AsyncVerboseIDModel(VerboseIDMixin):
+    ID_CHECK_BATCH_SIZE = 2
+
+    @property
+    def prefix(self):
+        return 'TEST-ASYNC-ID'
+
+
+class AsyncTransactionalIDModel(TransactionalIDMixin):
+    SUFFIX_LENGTH = 3
+    CHAIN_FIELD = 'vid'
+    ID_CHECK_BATCH_SIZE = 2
+
+    vid = peewee.ForeignKeyField(AsyncVerboseIDModel)
+
+    @property
+    def prefix(self):
+        return 'TEST-ASYNC-TRAN-ID'
+
+
+class AsyncOrderedModel(OrderedModelMixin):
+    pass
+
+
+MODELS = (AsyncVerboseIDModel, AsyncTransactionalIDModel, AsyncOrderedModel)
+
+
+@pytest.fixture
+def file_db(tmp_path):
+    database = peewee.SqliteDatabase(str(tmp_path / 'test.db'))
+    with database.bind_ctx(MODELS):
+        database.create_tables(MODELS)
+        database.close()
+        yield database
+
+
+def test_asave(file_db):
+    obj = AsyncVerboseIDModel()
+
+    asyncio.run(obj.asave())
+
+    assert obj.id.startswith('TEST-ASYNC-ID-')
+    assert AsyncVerboseIDModel.get_by_id(obj.id)
+
+
+def test_agenerate_id(file_db):
+    obj = AsyncVerboseIDModel()
+
+    asyncio.run(obj.agenerate_id())
+
+    assert obj.id.startswith('TEST-ASYNC-ID-')
+
+
+def test_abulk_create_resolves_collisions_across_batches(file_db):
+    existing = AsyncVerboseIDModel.create()
+    ids = [existing.id, 'TEST-ASYNC-ID-0001', 'TEST-ASYNC-ID-0001', 'TEST-ASYNC-ID-0002']
+
+    with patch.object(VerboseIDFormat, 'generate_many', return_value=ids), patch(
+        'connect.utils.peewee.mixins.generate_verbose_id',
+        side_effect=[f'TEST-ASYNC-ID-{i:04}' for i in range(10, 20)],
+    ):
+        asyncio.run(AsyncVerboseIDModel.abulk_create([AsyncVerboseIDModel() for _ in range(4)]))
+
+    assert AsyncVerboseIDModel.select().count() == 5
+
+
+def test_abulk_create_transactional(file_db):
+    parent = AsyncVerboseIDModel.create()
+    objs = [AsyncTransactionalIDModel(vid=parent) for _ in range(5)]
+
+    asyncio.run(AsyncTransactionalIDModel.abulk_create(objs))
+
+    assert sorted(obj.chain_id for obj in objs) == [1, 2, 3, 4, 5]
+    assert AsyncTransactionalIDModel.select().count() == 5
+
+
+def test_asort(file_db):
+    obj0, obj1, obj2 = [AsyncOrderedModel.create() for _ in range(3)]
+
+    asyncio.run(obj2.asort(after=obj0))
+
+    assert [obj.id for obj in AsyncOrderedModel.select().order_by(AsyncOrderedModel.position)] == [
+        obj0.id, obj2.id, obj1.id,
+    ]
+
+
+def test_set_executor(file_db):
+    executor = aio.get_executor()
+    custom = ThreadPoolExecutor(max_workers=1)
+    aio.set_executor(custom)
+    try:
+        asyncio.run(AsyncOrderedModel().asave())
+
+        assert aio.get_executor() is custom
+        assert AsyncOrderedModel.select().count() == 1
+    finally:
+        aio.set_executor(executor)
+        custom.shutdown()
+
+
+def test_worker_connection_is_reused(file_db):
+    executor = aio.get_executor()
+    custom = ThreadPoolExecutor(max_workers=2)
+    aio.set_executor(custom)
+
+    async def save_all():
+        for _ in range(10):
+            await AsyncOrderedModel().asave()
+        await asyncio.gather(*(AsyncOrderedModel().asave() for _ in range(10)))
+
+    try:
+        with patch.object(file_db, '_connect', wraps=file_db._connect) as connect:
+            asyncio.run(save_all())
+
+        assert connect.call_count <= 2
+        assert AsyncOrderedModel.select().count() == 20
+    finally:
+        aio.set_executor(executor)
+        custom.shutdown()
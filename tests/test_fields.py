@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+import peewee
+import pytest
+
+from connect.utils.peewee.exceptions import InvalidVerboseIdException
+from connect.utils.peewee.fields import VerboseIDField
+from connect.utils.peewee.mixins import TransactionalIDMixin, VerboseIDMixin
+from tests.utils import db, use_test_database
+
+
+class IntVerboseIDModel(VerboseIDMixin):
+    id = VerboseIDField('TEST-INT', primary_key=True)
+
+    @property
+    def prefix(self):
+        return 'TEST-INT'
+
+    class Meta:
+        database = db
+
+
+class IntTransactionalIDModel(TransactionalIDMixin):
+    SUFFIX_LENGTH = 3
+    CHAIN_FIELD = 'parent'
+
+    id = VerboseIDField('TEST-INT-TR', chain_length=3, primary_key=True)
+    parent = peewee.ForeignKeyField(IntVerboseIDModel)
+
+    @property
+    def prefix(self):
+        return 'TEST-INT-TR'
+
+    class Meta:
+        database = db
+
+
+MODELS = (IntVerboseIDModel, IntTransactionalIDModel)
+
+
+def stored_ids(model):
+    return [row[0] for row in db.execute_sql(f'SELECT id FROM {model._meta.table_name}')]
+
+
+def test_verbose_id_field_render_and_parse():
+    field = VerboseIDField('PRD', suffix_length=10, separator_frequency=5, chain_length=2)
+
+    assert field.parse('PRD-12345-67890-01') == 123456789001
+    assert field.render(123456789001) == 'PRD-12345-67890-01'
+    assert field.parse('PRD-12345-67890') is None
+    assert field.parse('PR-12345-67890-01') is None
+    assert field.parse('PRD-12345-6789x-01') is None
+
+
+def test_verbose_id_field_too_long():
+    with pytest.raises(ValueError):
+        VerboseIDField('PRD', suffix_length=16, chain_length=3)
+
+
+@use_test_database(models=MODELS)
+@patch('connect.utils.peewee.mixins.generate_verbose_id', return_value='TEST-INT-123-456-789')
+def test_verbose_id_field_storage(mock_generate_verbose_id):
+    obj = IntVerboseIDModel.create()
+
+    assert obj.id == 'TEST-INT-123-456-789'
+    assert stored_ids(IntVerboseIDModel) == [123456789]
+    assert IntVerboseIDModel.get_by_id('TEST-INT-123-456-789').id == obj.id
+    assert IntVerboseIDModel.select().where(
+        IntVerboseIDModel.id.in_(['TEST-INT-123-456-789'])).count() == 1
+    assert IntVerboseIDModel.select().where(
+        IntVerboseIDModel.id.startswith('TEST-INT-123-')).count() == 1
+    assert IntVerboseIDModel.select().where(
+        IntVerboseIDModel.id.startswith('TEST-INT-124-')).count() == 0
+
+
+@use_test_database(models=MODELS)
+def test_verbose_id_field_invalid_lookup():
+    with pytest.raises(InvalidVerboseIdException):
+        IntVerboseIDModel.get_by_id('TEST-OTHER-123-456-789')
+
+    assert IntVerboseIDModel.select().where(
+        IntVerboseIDModel.id.startswith('TEST-OTHER-')).count() == 0
+
+
+@use_test_database(models=MODELS)
+def test_verbose_id_field_transactional():
+    parent = IntVerboseIDModel.create()
+    objs = [IntTransactionalIDModel.create(parent=parent) for _ in range(2)]
+    IntTransactionalIDModel.bulk_create([IntTransactionalIDModel(parent=parent) for _ in range(2)])
+
+    base_id = parent.id[len('TEST-INT-'):]
+    assert [obj.id for obj in objs] == [f'TEST-INT-TR-{base_id}-001', f'TEST-INT-TR-{base_id}-002']
+    assert sorted(stored_ids(IntTransactionalIDModel)) == [
+        int(base_id.replace('-', '')) * 1000 + chain_id for chain_id in range(1, 5)
+    ]
+    assert IntTransactionalIDModel.select().join(IntVerboseIDModel).where(
+        IntVerboseIDModel.id == parent.id).count() == 4
+
+
+@use_test_database(models=MODELS)
+def test_verbose_id_field_max_chain_ids_use_index():
+    parents = [IntVerboseIDModel.create() for _ in range(2)]
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        IntTransactionalIDModel.bulk_create([
+            IntTransactionalIDModel(parent=parent) for parent in parents
+        ])
+
+    sql, params = next(c.args for c in execute_sql.call_args_list if 'MAX(' in c.args[0])
+    plan = ' '.join(row[-1] for row in db.execute_sql(f'EXPLAIN QUERY PLAN {sql}', params))
+    assert 'SCAN' not in plan
+    assert IntTransactionalIDModel.select().count() == 2
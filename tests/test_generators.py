@@ -0,0 +1,285 @@
+from unittest.mock import patch
+
+import peewee
+import pytest
+
+from connect.utils.peewee.counters import counter_model
+from connect.utils.peewee.exceptions import IDSpaceExhaustedException, PartitionClaimedException
+from connect.utils.peewee.generators import (
+    BlockIDAllocator,
+    PartitionedIDGenerator,
+    TimeOrderedIDGenerator,
+)
+from connect.utils.peewee.mixins import VerboseIDMixin
+from tests.utils import db, use_test_database
+
+
+class BlockIDModel(VerboseIDMixin):
+    ID_GENERATOR = BlockIDAllocator(block_size=5, background=False)
+
+    @property
+    def prefix(self):
+        return 'TEST-BLOCK-ID'
+
+    class Meta:
+        database = db
+
+
+class SmallBlockIDModel(VerboseIDMixin):
+    SUFFIX_LENGTH = 1
+    ID_GENERATOR = BlockIDAllocator(block_size=5, background=False)
+
+    @property
+    def prefix(self):
+        return 'TEST-SMALL-ID'
+
+    class Meta:
+        database = db
+
+
+class TimeOrderedIDModel(VerboseIDMixin):
+    ID_GENERATOR = TimeOrderedIDGenerator(time_digits=4, resolution=60, clock=lambda: 0)
+
+    @property
+    def prefix(self):
+        return 'TEST-TIME-ID'
+
+    class Meta:
+        database = db
+
+
+class PartitionedIDModel(VerboseIDMixin):
+    SUFFIX_LENGTH = 6
+    ID_GENERATOR = PartitionedIDGenerator(node_id=7, node_digits=2, owner='node-a')
+
+    @property
+    def prefix(self):
+        return 'TEST-NODE-ID'
+
+    class Meta:
+        database = db
+
+
+def reserved(model, prefix):
+    counter = counter_model(model._meta.database)
+    return counter.get_by_id(f'{model._meta.table_name}:{prefix}').value
+
+
+@pytest.fixture
+def file_db(tmp_path):
+    # Blocks and partitions are reserved on a separate connection, which does not see an
+    # in-memory database
+    database = peewee.SqliteDatabase(str(tmp_path / 'test.db'))
+    models = (counter_model(database), BlockIDModel, SmallBlockIDModel, PartitionedIDModel)
+
+    with database.bind_ctx(models):
+        database.create_tables(models)
+        yield database
+
+    database.close()
+
+
+def test_block_allocator_reserves_blocks(file_db):
+    BlockIDModel.ID_GENERATOR._pools.clear()
+
+    objs = [BlockIDModel.create() for _ in range(6)]
+
+    assert len({obj.id for obj in objs}) == 6
+    assert all(obj.id.startswith('TEST-BLOCK-ID-') for obj in objs)
+    assert reserved(BlockIDModel, 'TEST-BLOCK-ID') == 10
+
+
+def test_block_allocator_bulk_create(file_db):
+    BlockIDModel.ID_GENERATOR._pools.clear()
+
+    BlockIDModel.bulk_create([BlockIDModel() for _ in range(12)])
+
+    assert BlockIDModel.select().count() == 12
+    assert reserved(BlockIDModel, 'TEST-BLOCK-ID') == 15
+
+
+def test_block_allocator_keeps_block_after_rollback(file_db):
+    first = BlockIDAllocator(block_size=5, background=False)
+    second = BlockIDAllocator(block_size=5, background=False)
+
+    with patch.object(BlockIDModel, 'ID_GENERATOR', first):
+        with file_db.atomic() as transaction:
+            BlockIDModel.create()
+            transaction.rollback()
+
+    assert reserved(BlockIDModel, 'TEST-BLOCK-ID') == 5
+
+    with patch.object(BlockIDModel, 'ID_GENERATOR', second):
+        ids = [BlockIDModel.create().id for _ in range(2)]
+    with patch.object(BlockIDModel, 'ID_GENERATOR', first):
+        ids.extend(BlockIDModel.create().id for _ in range(4))
+
+    assert len(set(ids)) == 6
+    assert BlockIDModel.select().count() == 6
+
+
+def test_block_allocator_skips_existing_ids_and_exhausts(file_db):
+    SmallBlockIDModel.ID_GENERATOR._pools.clear()
+    existing = SmallBlockIDModel.create()
+    SmallBlockIDModel.ID_GENERATOR._pools.clear()
+    counter_model(file_db).delete().execute()
+
+    ids = [SmallBlockIDModel.create().id for _ in range(8)]
+
+    assert existing.id not in ids
+    assert len(set(ids)) == 8
+    with pytest.raises(IDSpaceExhaustedException):
+        SmallBlockIDModel.create()
+
+
+def test_block_allocator_background_refill(file_db):
+    allocator = BlockIDAllocator(block_size=5, refill_threshold=0.8)
+    obj = BlockIDModel()
+
+    allocator.generate(obj)
+    allocator._threads[(BlockIDModel, 'TEST-BLOCK-ID')].join()
+
+    assert len(allocator._pools[(BlockIDModel, 'TEST-BLOCK-ID')]) == 9
+    assert reserved(BlockIDModel, 'TEST-BLOCK-ID') == 10
+
+
+@use_test_database(models=(TimeOrderedIDModel,))
+def test_time_ordered_ids():
+    generator = TimeOrderedIDModel.ID_GENERATOR
+    clock = [60 * 5, 60 * 5, 60 * 9000 + 60 * 7]
+
+    with patch.object(generator, 'clock', side_effect=clock):
+        first, second, wrapped = (TimeOrderedIDModel.create().id for _ in range(3))
+
+    assert first.startswith('TEST-TIME-ID-100-5')
+    assert second.startswith('TEST-TIME-ID-100-5')
+    assert wrapped.startswith('TEST-TIME-ID-100-7')
+    assert generator.lowest_id(TimeOrderedIDModel(), 60 * 6) == 'TEST-TIME-ID-100-600-000'
+    assert TimeOrderedIDModel.select().where(
+        TimeOrderedIDModel.id >= generator.lowest_id(TimeOrderedIDModel(), 60 * 6),
+    ).count() == 1
+
+
+def test_time_ordered_id_validation():
+    with pytest.raises(ValueError):
+        TimeOrderedIDGenerator(time_digits=0)
+
+    with pytest.raises(ValueError):
+        TimeOrderedIDGenerator(time_digits=9).generate(TimeOrderedIDModel())
+
+
+def test_partitioned_ids_are_not_checked(file_db):
+    generator = PartitionedIDModel.ID_GENERATOR
+    generator._counters.clear()
+
+    with patch.object(file_db, 'execute_sql', wraps=file_db.execute_sql) as execute_sql:
+        objs = [PartitionedIDModel.create() for _ in range(3)]
+        PartitionedIDModel.bulk_create([PartitionedIDModel() for _ in range(2)])
+
+    assert [obj.id for obj in objs] == [
+        'TEST-NODE-ID-007-000', 'TEST-NODE-ID-007-001', 'TEST-NODE-ID-007-002',
+    ]
+    assert PartitionedIDModel.select().count() == 5
+    selects = [
+        c.args[0] for c in execute_sql.call_args_list
+        if c.args[0].startswith('SELECT') and 'FROM "partitionedidmodel"' in c.args[0]
+    ]
+    # Only the counter seed, claims are made in the counter table
+    assert len(selects) == 1
+
+
+def test_partitioned_ids_continue_after_restart(file_db):
+    PartitionedIDModel.ID_GENERATOR._counters.clear()
+    PartitionedIDModel.create(id='TEST-NODE-ID-007-041')
+    PartitionedIDModel.create(id='TEST-NODE-ID-008-099')
+
+    restarted = PartitionedIDGenerator(node_id=7, node_digits=2, owner='node-a')
+    with patch.object(PartitionedIDModel, 'ID_GENERATOR', restarted):
+        assert PartitionedIDModel.create().id == 'TEST-NODE-ID-007-042'
+
+
+def test_partitions_do_not_overlap_random_ids(file_db):
+    PartitionedIDModel.ID_GENERATOR._counters.clear()
+    PartitionedIDModel.create(id='TEST-NODE-ID-799-999')
+    PartitionedIDModel.create(id='TEST-NODE-ID-070-999')
+
+    assert PartitionedIDModel.create().id == 'TEST-NODE-ID-007-000'
+
+
+def test_partition_claimed_by_another_node(file_db):
+    PartitionedIDModel.ID_GENERATOR._counters.clear()
+    PartitionedIDModel.ID_GENERATOR.claim(PartitionedIDModel())
+    other = PartitionedIDGenerator(node_id=7, node_digits=2, owner='node-b')
+
+    with pytest.raises(PartitionClaimedException):
+        other.claim(PartitionedIDModel())
+
+    PartitionedIDModel.ID_GENERATOR.release(PartitionedIDModel())
+    other.claim(PartitionedIDModel())
+    PartitionedIDGenerator(node_id=8, node_digits=2, owner='node-a').claim(PartitionedIDModel())
+
+
+def test_partitioned_id_validation():
+    with pytest.raises(ValueError):
+        PartitionedIDGenerator(node_id=100, node_digits=2)
+
+    with pytest.raises(ValueError):
+        PartitionedIDGenerator(node_id=1, node_digits=9).generate(PartitionedIDModel())
+
+    with pytest.raises(ValueError):
+        PartitionedIDGenerator(node_id=1, node_digits=5).generate(PartitionedIDModel())
+
+
+def test_partition_claimed_by_another_process_on_same_host(file_db):
+    first = PartitionedIDGenerator(node_id=3, node_digits=2)
+    second = PartitionedIDGenerator(node_id=3, node_digits=2)
+
+    assert first.generate(PartitionedIDModel()) == '003000'
+    with pytest.raises(PartitionClaimedException):
+        second.generate(PartitionedIDModel())
+
+    first.release(PartitionedIDModel())
+    assert second.generate(PartitionedIDModel()) == '003000'
+
+
+def test_partition_lease_is_renewed_and_expires(file_db):
+    clock = [1000]
+    first, second = (
+        PartitionedIDGenerator(node_id=3, node_digits=2, lease=60, clock=lambda: clock[0])
+        for _ in range(2)
+    )
+
+    assert first.generate(PartitionedIDModel()) == '003000'
+    clock[0] += 40
+    assert first.generate(PartitionedIDModel()) == '003001'
+
+    clock[0] += 40
+    with pytest.raises(PartitionClaimedException):
+        second.claim(PartitionedIDModel())
+
+    clock[0] += 30
+    second.claim(PartitionedIDModel())
+    with pytest.raises(PartitionClaimedException):
+        first.generate(PartitionedIDModel())
+
+
+def test_partition_is_claimed_again_after_fork(file_db):
+    generator = PartitionedIDGenerator(node_id=3, node_digits=2)
+    generator.generate(PartitionedIDModel())
+
+    with patch('os.getpid', return_value=-1):
+        with pytest.raises(PartitionClaimedException):
+            generator.generate(PartitionedIDModel())
+
+
+def test_partition_claim_is_kept_after_rollback(file_db):
+    generator = PartitionedIDGenerator(node_id=7, node_digits=2, owner='node-a')
+    other = PartitionedIDGenerator(node_id=7, node_digits=2, owner='node-b')
+
+    with patch.object(PartitionedIDModel, 'ID_GENERATOR', generator):
+        with file_db.atomic() as transaction:
+            PartitionedIDModel.create()
+            transaction.rollback()
+
+    with pytest.raises(PartitionClaimedException):
+        other.claim(PartitionedIDModel())
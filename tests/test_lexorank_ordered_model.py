@@ -0,0 +1,234 @@
+from unittest.mock import patch
+
+import peewee
+import pytest
+
+from connect.utils.peewee.exceptions import MissedPositionFieldException
+from connect.utils.peewee.mixins import LexoRankOrderedModelMixin, VerboseIDMixin
+from connect.utils.peewee.utils import rank_after, rank_between, spaced_rank
+from tests.utils import db, use_test_database
+
+
+class LexoRankTestModel(VerboseIDMixin, LexoRankOrderedModelMixin):
+    POSITION_FIELD = 'old_position'
+    ORDER_SCOPE = ('tenant',)
+
+    @property
+    def prefix(self):
+        return 'TEST-LEXO-ORD'
+
+    tenant = peewee.CharField(null=True)
+    old_position = peewee.BigIntegerField(null=True)
+
+    class Meta:
+        database = db
+
+
+class NoSourceLexoRankTestModel(VerboseIDMixin, LexoRankOrderedModelMixin):
+    @property
+    def prefix(self):
+        return 'TEST-LEXO-NS-ORD'
+
+    class Meta:
+        database = db
+
+
+def ordered_ids(tenant=None):
+    query = LexoRankTestModel.select().where(LexoRankTestModel.tenant == tenant)
+    return [obj.id for obj in query.order_by(LexoRankTestModel.position, LexoRankTestModel.id)]
+
+
+@pytest.mark.parametrize(('lower', 'upper', 'rank'), (
+    (None, None, 'i'),
+    ('i', None, 'r'),
+    (None, 'i', '9'),
+    ('z', None, 'zi'),
+    (None, '1', '0i'),
+    ('a', 'b', 'ai'),
+    ('az', 'b', 'azi'),
+    ('0i', '1', '0r'),
+))
+def test_rank_between(lower, upper, rank):
+    assert rank_between(lower, upper) == rank
+
+
+def test_rank_between_invalid_bounds():
+    with pytest.raises(ValueError):
+        rank_between('b', 'a')
+
+
+@pytest.mark.parametrize(('lower', 'rank'), (
+    (None, 'i'),
+    ('i', 'i001'),
+    ('i00zz', 'i010z'),
+    ('i001i', 'i002i'),
+    ('zzzzz', 'zzzzz0i'),
+    ('zzzzzzi', 'zzzzzzi001'),
+))
+def test_rank_after(lower, rank):
+    assert rank_after(lower) == rank
+
+
+def test_rank_after_keeps_length():
+    ranks = [rank_after(None)]
+    for _ in range(5000):
+        ranks.append(rank_after(ranks[-1]))
+
+    assert ranks == sorted(set(ranks))
+    assert max(len(rank) for rank in ranks) <= 6
+
+
+def test_spaced_ranks():
+    ranks = [spaced_rank(index, 100) for index in range(100)]
+
+    assert ranks == sorted(set(ranks))
+    assert [spaced_rank(index, 3) for index in range(3)] == ['9', 'i', 'r']
+
+
+@use_test_database(models=(LexoRankTestModel,))
+def test_lexorank_default_position():
+    objs = [LexoRankTestModel.create(tenant=tenant) for tenant in ('a', 'a', 'b', 'a')]
+
+    assert [obj.position for obj in objs] == ['i', 'i001', 'i', 'i002']
+
+
+@use_test_database(models=(LexoRankTestModel,))
+def test_lexorank_sort_updates_one_row():
+    objs = [LexoRankTestModel.create() for _ in range(4)]
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        objs[3].sort(after=objs[0])
+        objs[0].sort(before=objs[2])
+        objs[1].sort()
+
+    updates = [c for c in execute_sql.call_args_list if c.args[0].startswith('UPDATE')]
+    assert len(updates) == 3
+    assert ordered_ids() == [obj.id for obj in (objs[1], objs[3], objs[0], objs[2])]
+
+
+@use_test_database(models=(LexoRankTestModel,))
+def test_lexorank_sort_many_times_after_same_object():
+    first, last = LexoRankTestModel.create(), LexoRankTestModel.create()
+
+    objs = []
+    for _ in range(50):
+        objs.insert(0, LexoRankTestModel.create())
+        objs[0].sort(after=first)
+
+    assert ordered_ids() == [first.id] + [obj.id for obj in objs] + [last.id]
+
+
+@use_test_database(models=(LexoRankTestModel,))
+def test_lexorank_sort_with_same():
+    obj = LexoRankTestModel.create()
+
+    with pytest.raises(ValueError):
+        obj.sort(before=obj)
+
+
+@use_test_database(models=(LexoRankTestModel,))
+def test_lexorank_migrate_positions():
+    for tenant, old_position in (('a', 30), ('a', 10), ('b', 10), ('a', 20), ('a', None)):
+        LexoRankTestModel.create(tenant=tenant, old_position=old_position, position='')
+
+    assert LexoRankTestModel.migrate_positions(chunk_size=2) == 4
+
+    objs = LexoRankTestModel.select().where(LexoRankTestModel.tenant == 'a').order_by(
+        LexoRankTestModel.old_position)
+    assert [(obj.old_position, obj.position) for obj in objs] == [
+        (None, ''), (10, '9'), (20, 'i'), (30, 'r'),
+    ]
+    assert LexoRankTestModel.get(tenant='b').position == 'i'
+
+
+def test_lexorank_migrate_positions_without_source():
+    with pytest.raises(MissedPositionFieldException):
+        NoSourceLexoRankTestModel.migrate_positions()
+
+
+@use_test_database(models=(LexoRankTestModel,))
+def test_lexorank_navigation():
+    objs = [LexoRankTestModel.create(tenant='a') for _ in range(3)]
+    objs[2].sort(before=objs[0])
+
+    page, _ = LexoRankTestModel.page_after(limit=2, scope={'tenant': 'a'})
+    assert [obj.id for obj in page] == [objs[2].id, objs[0].id]
+    assert LexoRankTestModel.item_at(-1, scope={'tenant': 'a'}).id == objs[1].id
+    assert objs[0].next_element.id == objs[1].id
+    assert objs[2].rank() == 0
+
+
+@use_test_database(models=(LexoRankTestModel,))
+def test_lexorank_import_chunks():
+    objs = [LexoRankTestModel.create(tenant='a') for _ in range(3)]
+    LexoRankTestModel.create(tenant='b')
+    chunks = LexoRankTestModel.export_chunks(scope={'tenant': 'a'}, chunk_size=2)
+
+    assert LexoRankTestModel.import_chunks(chunks, overrides={'tenant': 'b'}) == 3
+
+    copies = ordered_ids('b')
+    assert len(copies) == 4
+    assert not set(copies) & {obj.id for obj in objs}
+
+
+@use_test_database(models=(LexoRankTestModel,))
+def test_lexorank_appends_keep_rank_length():
+    LexoRankTestModel.create(tenant='a')
+    for _ in range(3):
+        LexoRankTestModel.bulk_create([LexoRankTestModel(tenant='a') for _ in range(1000)])
+    last = LexoRankTestModel.create(tenant='a')
+    LexoRankTestModel.create(tenant='a').sort(after=last)
+
+    ranks = [obj.position for obj in LexoRankTestModel.select()]
+    assert len(set(ranks)) == 3003
+    assert max(len(rank) for rank in ranks) <= 6
+
+
+@use_test_database(models=(LexoRankTestModel,))
+def test_lexorank_rebalance():
+    objs = [LexoRankTestModel.create(tenant='a')]
+    for _ in range(300):
+        objs.insert(0, LexoRankTestModel.create(tenant='a'))
+        objs[0].sort(before=objs[1])
+    other = LexoRankTestModel.create(tenant='b')
+    expected = [obj.id for obj in objs]
+    assert max(len(obj.position) for obj in LexoRankTestModel.select()) > 50
+
+    for _ in LexoRankTestModel.iter_rebalance(scope={'tenant': 'a'}, chunk_size=50):
+        assert ordered_ids('a') == expected
+
+    ranks = [obj.position for obj in LexoRankTestModel.select().where(
+        LexoRankTestModel.tenant == 'a').order_by(LexoRankTestModel.position)]
+    assert ranks == [spaced_rank(index, 301) for index in range(301)]
+    assert LexoRankTestModel.get_by_id(other.id).position == other.position
+
+    with pytest.raises(ValueError):
+        LexoRankTestModel.rebalance(low='1')
+
+
+@use_test_database(models=(LexoRankTestModel,))
+def test_lexorank_sort_validates_rank_length():
+    first = LexoRankTestModel.create()
+    obj = LexoRankTestModel.create()
+
+    with patch.object(LexoRankTestModel._meta.fields['position'], 'max_length', 3):
+        with pytest.raises(ValueError, match='rebalance'):
+            for _ in range(20):
+                obj.sort(before=first)
+                first, obj = obj, first
+
+    assert ordered_ids() == [first.id, obj.id]
+    assert obj.position == LexoRankTestModel.get_by_id(obj.id).position
+
+
+@use_test_database(models=(LexoRankTestModel,))
+def test_lexorank_sort_next_to_tied_ranks():
+    tied = sorted((LexoRankTestModel.create() for _ in range(3)), key=lambda obj: obj.id)
+    LexoRankTestModel.update(position='i').execute()
+    last, obj = LexoRankTestModel.create(), LexoRankTestModel.create()
+
+    obj.sort(after=LexoRankTestModel.get_by_id(tied[0].id))
+    assert ordered_ids() == [tied[0].id, obj.id, tied[1].id, tied[2].id, last.id]
+
+    obj.sort(before=LexoRankTestModel.get_by_id(tied[2].id))
+    assert ordered_ids() == [tied[0].id, tied[1].id, obj.id, tied[2].id, last.id]
@@ -0,0 +1,177 @@
+import threading
+from unittest.mock import patch
+
+import peewee
+import pytest
+
+from connect.utils.peewee import metrics
+from connect.utils.peewee.mixins import OrderedModelMixin, VerboseIDMixin
+from connect.utils.peewee.utils import VerboseIDFormat
+from tests.utils import db, use_test_database
+
+
+class MetricsVerboseIDModel(VerboseIDMixin):
+    @property
+    def prefix(self):
+        return 'TEST-METRICS-ID'
+
+    class Meta:
+        database = db
+
+
+class MetricsOrderedModel(OrderedModelMixin):
+    name = peewee.CharField(null=True)
+
+    class Meta:
+        database = db
+
+
+@pytest.fixture
+def events():
+    events = []
+    metrics.add_sink(events.append)
+    yield events
+    metrics.remove_sink(events.append)
+
+
+def only(events, operation):
+    return [event for event in events if event.operation == operation]
+
+
+def test_track_without_sinks_is_noop():
+    tracker = metrics.track(MetricsVerboseIDModel, 'generate_id')
+
+    with tracker:
+        tracker.attempts += 1
+
+    assert tracker is metrics._NULL_TRACKER
+    assert tracker.attempts == 0
+
+
+@use_test_database(models=(MetricsVerboseIDModel,))
+def test_generate_id_collisions(events):
+    existing = MetricsVerboseIDModel.create()
+    del events[:]
+
+    with patch(
+        'connect.utils.peewee.mixins.generate_verbose_id',
+        side_effect=[existing.id, existing.id, 'TEST-METRICS-ID-0001'],
+    ):
+        MetricsVerboseIDModel.create()
+
+    generate_id, = only(events, 'generate_id')
+    save, = only(events, 'save')
+    assert (generate_id.attempts, generate_id.collisions, generate_id.queries) == (3, 2, 3)
+    assert generate_id.model is MetricsVerboseIDModel
+    assert save.queries == 4
+    assert save.seconds >= generate_id.seconds
+    assert save.error is None
+
+
+@use_test_database(models=(MetricsVerboseIDModel,))
+def test_generate_id_error(events):
+    existing = MetricsVerboseIDModel.create()
+
+    with patch('connect.utils.peewee.mixins.generate_verbose_id', return_value=existing.id):
+        with pytest.raises(Exception, match=MetricsVerboseIDModel.ITERATION_ERROR):
+            MetricsVerboseIDModel.create()
+
+    generate_id = only(events, 'generate_id')[-1]
+    assert generate_id.collisions == MetricsVerboseIDModel.MAX_ID_GENERATION_ITERATIONS
+    assert str(generate_id.error) == MetricsVerboseIDModel.ITERATION_ERROR
+
+
+@use_test_database(models=(MetricsVerboseIDModel,))
+def test_bulk_generate_ids_collisions(events):
+    existing = MetricsVerboseIDModel.create()
+
+    with patch.object(
+        VerboseIDFormat,
+        'generate_many',
+        return_value=[existing.id, 'TEST-METRICS-ID-0001'],
+    ), patch(
+        'connect.utils.peewee.mixins.generate_verbose_id',
+        return_value='TEST-METRICS-ID-0002',
+    ):
+        MetricsVerboseIDModel.bulk_create([MetricsVerboseIDModel() for _ in range(2)])
+
+    event, = only(events, 'bulk_generate_ids')
+    assert (event.attempts, event.collisions, event.queries) == (3, 1, 2)
+
+
+@pytest.mark.provide_objects(model=MetricsOrderedModel, count=4)
+def test_sort_rows(events, obj0, obj1, obj2, obj3):
+    obj3.sort(after=obj0)
+
+    event, = only(events, 'sort')
+    assert event.rows == 3
+    assert event.model is MetricsOrderedModel
+
+
+@pytest.mark.provide_objects(model=MetricsOrderedModel, count=3)
+def test_reorder_rows(events, obj0, obj1, obj2):
+    assert MetricsOrderedModel.reorder([obj2.id, obj0.id, obj1.id]) == 3
+    assert only(events, 'reorder')[0].rows == 3
+
+
+@use_test_database(models=(MetricsVerboseIDModel,))
+def test_failing_sink_is_logged(events, caplog):
+    def failing_sink(event):
+        raise ValueError('sink error')
+
+    metrics.add_sink(failing_sink)
+    try:
+        MetricsVerboseIDModel.create()
+    finally:
+        metrics.remove_sink(failing_sink)
+
+    assert MetricsVerboseIDModel.select().count() == 1
+    assert 'Metrics sink' in caplog.text
+    assert only(events, 'save')
+
+
+@use_test_database(models=(MetricsVerboseIDModel,))
+def test_query_counting_is_removed_with_last_sink():
+    events = []
+    metrics.add_sink(events.append)
+    MetricsVerboseIDModel.create()
+    assert 'execute_sql' in vars(db)
+
+    metrics.remove_sink(events.append)
+
+    assert 'execute_sql' not in vars(db)
+    assert events[-1].queries > 0
+
+
+@use_test_database(models=(MetricsVerboseIDModel,))
+def test_query_counting_survives_other_wrappers(events):
+    MetricsVerboseIDModel.create()
+    wrapper = vars(db)['execute_sql']
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql):
+        del events[:]
+        MetricsVerboseIDModel.create()
+        assert only(events, 'save')[0].queries == 2
+
+    assert vars(db)['execute_sql'] is wrapper
+    del db.execute_sql
+    del events[:]
+    MetricsVerboseIDModel.create()
+    assert only(events, 'save')[0].queries == 2
+
+
+def test_concurrent_tracking_wraps_once():
+    database = peewee.SqliteDatabase(':memory:')
+    barrier = threading.Barrier(8)
+
+    def count_queries():
+        barrier.wait()
+        metrics._count_queries(database)
+
+    threads = [threading.Thread(target=count_queries) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not hasattr(vars(database)['execute_sql'].__wrapped__, 'counts_queries')
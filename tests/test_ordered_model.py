@@ -1,8 +1,10 @@
+from unittest.mock import patch
+
 import peewee
 import pytest
 
 from connect.utils.peewee.mixins import OrderedModelMixin, VerboseIDMixin
-from tests.utils import db
+from tests.utils import db, use_test_database
 
 
 class OrderedTestModel(VerboseIDMixin, OrderedModelMixin):
@@ -104,3 +106,598 @@ def test_sort_after_no_element_in_between(obj0, obj1, obj2, obj3):
     objs = refresh_objects(OrderedTestModel, [obj0, obj1, obj2, obj3])
 
     assert [obj.position for obj in objs] == [10000, 20000, 30000, 40000]
+
+
+class GapOrderedTestModel(VerboseIDMixin, OrderedModelMixin):
+    SORT_MODE = OrderedModelMixin.SORT_MODE_GAP
+    GAP_RENUMBER_WINDOW = 1
+
+    @property
+    def prefix(self):
+        return 'TEST-GAP-ORD'
+
+    class Meta:
+        database = db
+
+
+class SingleOrderedTestModel(VerboseIDMixin, OrderedModelMixin):
+    SORT_MODE = OrderedModelMixin.SORT_MODE_SINGLE
+    ORDER_SCOPE = ('tenant',)
+
+    @property
+    def prefix(self):
+        return 'TEST-SINGLE-ORD'
+
+    tenant = peewee.CharField(null=True)
+    name = peewee.CharField(null=True)
+
+    class Meta:
+        database = db
+
+
+def positions(model, objs):
+    return [obj.position for obj in refresh_objects(model, objs)]
+
+
+@pytest.mark.provide_objects(model=GapOrderedTestModel, count=3)
+def test_gap_sort_after(obj0, obj1, obj2):
+    obj2.sort(after=obj0)
+
+    assert positions(GapOrderedTestModel, [obj0, obj1, obj2]) == [10000, 20000, 15000]
+
+
+@pytest.mark.provide_objects(model=GapOrderedTestModel, count=3)
+def test_gap_sort_before(obj0, obj1, obj2):
+    obj0.sort(before=obj2)
+
+    assert positions(GapOrderedTestModel, [obj0, obj1, obj2]) == [25000, 20000, 30000]
+
+
+@pytest.mark.provide_objects(model=GapOrderedTestModel, count=3)
+def test_gap_sort_place_at_top_and_bottom(obj0, obj1, obj2):
+    obj1.sort()
+    obj0.sort(after=obj2)
+
+    assert positions(GapOrderedTestModel, [obj0, obj1, obj2]) == [40000, 0, 30000]
+
+
+@pytest.mark.provide_objects(model=GapOrderedTestModel, count=5)
+def test_gap_sort_renumbers_window_when_gap_is_exhausted(obj0, obj1, obj2, obj3, obj4):
+    for position, obj in enumerate((obj0, obj1, obj2, obj3), start=1):
+        obj.position = position
+        obj.save()
+
+    obj4.sort(after=obj1)
+
+    objs = GapOrderedTestModel.select().order_by(GapOrderedTestModel.position)
+    assert [obj.id for obj in objs] == [obj.id for obj in (obj0, obj1, obj4, obj2, obj3)]
+    assert positions(GapOrderedTestModel, [obj0, obj1, obj4, obj2, obj3]) == [
+        1, 10001, 20001, 30001, 40001,
+    ]
+
+
+@pytest.mark.provide_objects(model=GapOrderedTestModel, count=5)
+def test_gap_sort_renumbers_only_window(obj0, obj1, obj2, obj3, obj4):
+    for position, obj in zip((10000, 10001, 10002, 10003, 20000), (obj0, obj1, obj2, obj3, obj4)):
+        obj.position = position
+        obj.save()
+
+    obj3.sort(after=obj1)
+
+    assert positions(GapOrderedTestModel, [obj0, obj1, obj3, obj2, obj4]) == [
+        10000, 12500, 15000, 17500, 20000,
+    ]
+
+
+@use_test_database(models=(GapOrderedTestModel,))
+def test_gap_sort_next_to_tied_positions():
+    tied = sorted((GapOrderedTestModel.create() for _ in range(3)), key=lambda obj: obj.id)
+    GapOrderedTestModel.update(position=10000).execute()
+    last, obj = GapOrderedTestModel.create(), GapOrderedTestModel.create()
+
+    obj.sort(after=refresh_objects(GapOrderedTestModel, tied[0])[0])
+    assert ordered_ids(GapOrderedTestModel) == [
+        tied[0].id, obj.id, tied[1].id, tied[2].id, last.id,
+    ]
+
+    obj.sort(before=refresh_objects(GapOrderedTestModel, tied[2])[0])
+    assert ordered_ids(GapOrderedTestModel) == [
+        tied[0].id, tied[1].id, obj.id, tied[2].id, last.id,
+    ]
+
+
+class ScopedOrderedTestModel(VerboseIDMixin, OrderedModelMixin):
+    ORDER_SCOPE = ('tenant',)
+
+    @property
+    def prefix(self):
+        return 'TEST-SCOPED-ORD'
+
+    tenant = peewee.CharField(null=True)
+
+    class Meta:
+        database = db
+
+
+def test_scoped_model_index():
+    assert (('tenant', 'position'), False) in ScopedOrderedTestModel._meta.indexes
+
+
+@use_test_database(models=(ScopedOrderedTestModel,))
+def test_scoped_default_position_value():
+    objs = [ScopedOrderedTestModel.create(tenant=tenant) for tenant in ('a', 'b', 'a', None)]
+
+    assert [obj.position for obj in objs] == [10000, 10000, 20000, 10000]
+
+
+@use_test_database(models=(ScopedOrderedTestModel,))
+def test_scoped_sort():
+    objs_a = [ScopedOrderedTestModel.create(tenant='a') for _ in range(3)]
+    objs_b = [ScopedOrderedTestModel.create(tenant='b') for _ in range(3)]
+
+    objs_a[2].sort(after=objs_a[0])
+    refresh_objects(ScopedOrderedTestModel, objs_a[1])[0].sort()
+
+    assert positions(ScopedOrderedTestModel, objs_a) == [20000, 10000, 30000]
+    assert positions(ScopedOrderedTestModel, objs_b) == [10000, 20000, 30000]
+
+
+@use_test_database(models=(ScopedOrderedTestModel,))
+def test_scoped_sort_with_other_scope():
+    obj_a = ScopedOrderedTestModel.create(tenant='a')
+    obj_b = ScopedOrderedTestModel.create(tenant='b')
+
+    with pytest.raises(ValueError):
+        obj_a.sort(before=obj_b)
+
+
+class CachedOrderedTestModel(VerboseIDMixin, OrderedModelMixin):
+    CACHE_TAIL_POSITION = True
+
+    @property
+    def prefix(self):
+        return 'TEST-CACHED-ORD'
+
+    class Meta:
+        database = db
+
+
+def max_position_queries(execute_sql):
+    return len([c for c in execute_sql.call_args_list if 'MAX("t1"."position")' in c.args[0]])
+
+
+@use_test_database(models=(CachedOrderedTestModel,))
+def test_cached_tail_position():
+    CachedOrderedTestModel.invalidate_tail_cache()
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        objs = [CachedOrderedTestModel.create() for _ in range(3)]
+
+    assert [obj.position for obj in objs] == [10000, 20000, 30000]
+    assert max_position_queries(execute_sql) == 1
+
+
+@use_test_database(models=(CachedOrderedTestModel,))
+def test_cached_tail_position_invalidation():
+    CachedOrderedTestModel.invalidate_tail_cache()
+    objs = [CachedOrderedTestModel.create() for _ in range(3)]
+
+    objs[2].delete_instance()
+    assert CachedOrderedTestModel.create().position == 30000
+
+    CachedOrderedTestModel.create(position=50000)
+    assert CachedOrderedTestModel.create().position == 60000
+
+
+@use_test_database(models=(ScopedOrderedTestModel,))
+def test_bulk_create_assigns_tail_positions():
+    ScopedOrderedTestModel.create(tenant='a')
+    objs = [ScopedOrderedTestModel(tenant=tenant) for tenant in ('a', 'b', 'a', 'b')]
+    objs.append(ScopedOrderedTestModel(tenant='a', position=5000))
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        ScopedOrderedTestModel.bulk_create(objs)
+
+    assert [obj.position for obj in objs] == [20000, 10000, 30000, 20000, 5000]
+    assert max_position_queries(execute_sql) == 2
+
+
+def update_queries(execute_sql):
+    return len([c for c in execute_sql.call_args_list if c.args[0].startswith('UPDATE')])
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=4)
+def test_reorder(obj0, obj1, obj2, obj3):
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        updated = OrderedTestModel.reorder([obj3.id, obj0.id, obj1.id, obj2.id])
+
+    assert updated == 4
+    assert update_queries(execute_sql) == 1
+    assert positions(OrderedTestModel, [obj3, obj0, obj1, obj2]) == [10000, 20000, 30000, 40000]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=4)
+def test_reorder_part_of_list(obj0, obj1, obj2, obj3):
+    assert OrderedTestModel.reorder([obj0.id, obj3.id, obj1.id, 'UNKNOWN']) == 2
+
+    assert positions(OrderedTestModel, [obj0, obj3, obj1, obj2]) == [10000, 20000, 40000, 30000]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=3)
+def test_reorder_without_changes(obj0, obj1, obj2):
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        assert OrderedTestModel.reorder([obj0.id, obj1.id, obj2.id]) == 0
+
+    assert update_queries(execute_sql) == 0
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=3)
+def test_reorder_with_same_positions(obj0, obj1, obj2):
+    OrderedTestModel.update(position=10000).execute()
+
+    OrderedTestModel.reorder([obj2.id, obj1.id, obj0.id])
+
+    assert positions(OrderedTestModel, [obj2, obj1, obj0]) == [10000, 20000, 30000]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=6)
+def test_sort_many_after(obj0, obj1, obj2, obj3, obj4, obj5):
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        OrderedTestModel.sort_many([obj4, obj1], after=obj2)
+
+    assert update_queries(execute_sql) == 2
+    assert positions(OrderedTestModel, [obj0, obj2, obj1, obj4, obj3, obj5]) == [
+        10000, 30000, 40000, 50000, 60000, 80000,
+    ]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=5)
+def test_sort_many_before(obj0, obj1, obj2, obj3, obj4):
+    OrderedTestModel.sort_many([obj3, obj4], before=obj1)
+
+    assert positions(OrderedTestModel, [obj0, obj3, obj4, obj1, obj2]) == [
+        10000, 20000, 30000, 40000, 50000,
+    ]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=4)
+def test_sort_many_place_at_top_and_bottom(obj0, obj1, obj2, obj3):
+    OrderedTestModel.sort_many([obj3, obj2])
+    assert positions(OrderedTestModel, [obj2, obj3, obj0, obj1]) == [10000, 20000, 30000, 40000]
+
+    OrderedTestModel.sort_many([obj0, obj2], after=obj1)
+    assert positions(OrderedTestModel, [obj3, obj1, obj2, obj0]) == [20000, 40000, 50000, 60000]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=2)
+def test_sort_many_with_target_in_selection(obj0, obj1):
+    with pytest.raises(ValueError):
+        OrderedTestModel.sort_many([obj0, obj1], before=obj1)
+
+
+@pytest.mark.provide_objects(model=GapOrderedTestModel, count=4)
+def test_gap_sort_many_fits_in_gap(obj0, obj1, obj2, obj3):
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        GapOrderedTestModel.sort_many([obj2, obj3], after=obj0)
+
+    assert update_queries(execute_sql) == 1
+    assert positions(GapOrderedTestModel, [obj0, obj2, obj3, obj1]) == [
+        10000, 13333, 16666, 20000,
+    ]
+
+
+def ordered_ids(model):
+    return [obj.id for obj in model.select().order_by(model.position, model.id)]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=5)
+def test_rebalance(obj0, obj1, obj2, obj3, obj4):
+    for position, obj in zip((-5, 1, 2, 3, 10**12), (obj0, obj1, obj2, obj3, obj4)):
+        obj.position = position
+        obj.save()
+    expected = ordered_ids(OrderedTestModel)
+
+    checkpoints = []
+    for checkpoint in OrderedTestModel.iter_rebalance(chunk_size=2):
+        checkpoints.append(checkpoint)
+        assert ordered_ids(OrderedTestModel) == expected
+
+    assert [checkpoint.phase for checkpoint in checkpoints] == ['down'] * 2 + ['up'] * 3 + ['done']
+    assert checkpoints[-1].updated == 5
+    assert positions(OrderedTestModel, [obj0, obj1, obj2, obj3, obj4]) == [
+        10000, 20000, 30000, 40000, 50000,
+    ]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=4)
+def test_rebalance_resume(obj0, obj1, obj2, obj3):
+    OrderedTestModel.update(position=OrderedTestModel.position * 2).execute()
+
+    checkpoint = next(OrderedTestModel.iter_rebalance(chunk_size=1))
+    assert checkpoint.phase == 'down'
+
+    assert OrderedTestModel.rebalance(chunk_size=1, checkpoint=checkpoint) == 4
+    assert positions(OrderedTestModel, [obj0, obj1, obj2, obj3]) == [10000, 20000, 30000, 40000]
+
+
+@use_test_database(models=(ScopedOrderedTestModel,))
+def test_rebalance_scope():
+    objs_a = [ScopedOrderedTestModel.create(tenant='a', position=i) for i in range(1, 4)]
+    objs_b = [ScopedOrderedTestModel.create(tenant='b', position=i) for i in range(1, 4)]
+
+    assert ScopedOrderedTestModel.rebalance(scope={'tenant': 'a'}) == 3
+    assert positions(ScopedOrderedTestModel, objs_a) == [10000, 20000, 30000]
+    assert positions(ScopedOrderedTestModel, objs_b) == [1, 2, 3]
+
+    assert ScopedOrderedTestModel.rebalance() == 3
+    assert positions(ScopedOrderedTestModel, objs_b) == [10000, 20000, 30000]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=5)
+def test_rebalance_dense_region(obj0, obj1, obj2, obj3, obj4):
+    for position, obj in zip((10000, 10001, 10002, 10003, 20000), (obj0, obj1, obj2, obj3, obj4)):
+        obj.position = position
+        obj.save()
+
+    OrderedTestModel.rebalance(low=10001, high=10003)
+
+    assert positions(OrderedTestModel, [obj0, obj1, obj2, obj3, obj4]) == [
+        10000, 12500, 15000, 17500, 20000,
+    ]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=6)
+def test_rebalance_region_resume(obj0, obj1, obj2, obj3, obj4, obj5):
+    objs = [obj0, obj1, obj2, obj3, obj4, obj5]
+    for position, obj in zip((0, 9000, 9001, 9002, 9003, 10000), objs):
+        obj.position = position
+        obj.save()
+
+    checkpoint = next(OrderedTestModel.iter_rebalance(low=9000, high=9003, chunk_size=1))
+    assert checkpoint.spacing == (0, 2000)
+
+    OrderedTestModel.rebalance(low=9000, high=9003, chunk_size=1, checkpoint=checkpoint)
+
+    assert positions(OrderedTestModel, objs) == [0, 2000, 4000, 6000, 8000, 10000]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=2)
+def test_page_cursor_uses_position_index(obj0, obj1):
+    cursor = (obj0.position, obj0.id)
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        OrderedTestModel.page_after(cursor)
+        OrderedTestModel.page_before(cursor)
+
+    for sql, params in (c.args for c in execute_sql.call_args_list):
+        plan = ' '.join(row[-1] for row in db.execute_sql(f'EXPLAIN QUERY PLAN {sql}', params))
+        assert 'SEARCH' in plan and 'SCAN' not in plan
+
+
+@use_test_database(models=(ScopedOrderedTestModel,))
+def test_page_with_fields_keeps_scope():
+    objs = [ScopedOrderedTestModel.create(tenant=tenant) for tenant in ('a', 'a', 'a', None, None)]
+    fields = [ScopedOrderedTestModel.id]
+
+    page, _ = ScopedOrderedTestModel.page_after(scope={'tenant': 'a'}, fields=fields)
+    item = ScopedOrderedTestModel.item_at(-1, scope={'tenant': 'a'}, fields=fields)
+
+    assert [obj.tenant for obj in page] == ['a', 'a', 'a']
+    assert page[0].next_element.id == objs[1].id
+    assert item.id == objs[2].id and item.previous_element.id == objs[1].id
+
+    page[2].sort(before=page[0])
+
+    assert positions(ScopedOrderedTestModel, objs) == [20000, 30000, 10000, 10000, 20000]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=5)
+def test_page_after_and_before(obj0, obj1, obj2, obj3, obj4):
+    first, cursor = OrderedTestModel.page_after(limit=2)
+    second, cursor = OrderedTestModel.page_after(cursor, limit=2, fields=[OrderedTestModel.id])
+
+    assert [obj.id for obj in first] == [obj0.id, obj1.id]
+    assert [obj.id for obj in second] == [obj2.id, obj3.id]
+    assert cursor == (obj3.position, obj3.id)
+    assert second[0].name is None and 'name' not in second[0].__data__
+
+    previous, cursor = OrderedTestModel.page_before((obj3.position, obj3.id), limit=2)
+    assert [obj.id for obj in previous] == [obj1.id, obj2.id]
+    assert cursor == (obj1.position, obj1.id)
+    assert OrderedTestModel.page_before(cursor) == ([obj0], (obj0.position, obj0.id))
+    assert OrderedTestModel.page_after((obj4.position, obj4.id)) == (
+        [], (obj4.position, obj4.id),
+    )
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=5)
+def test_pages_with_same_positions(obj0, obj1, obj2, obj3, obj4):
+    objs = [obj0, obj1, obj2, obj3, obj4]
+    for obj, position in zip(objs, (10, 20, 20, 20, 30)):
+        obj.position = position
+        obj.save()
+    ordered = [obj.id for obj in OrderedTestModel.select().order_by(
+        OrderedTestModel.position, OrderedTestModel.id)]
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = OrderedTestModel.page_after(cursor, limit=2)
+        if not page:
+            break
+        pages.extend(obj.id for obj in page)
+
+    backwards, cursor = [], (obj4.position, obj4.id)
+    while True:
+        page, cursor = OrderedTestModel.page_before(cursor, limit=2)
+        if not page:
+            break
+        backwards[:0] = [obj.id for obj in page]
+
+    middle = OrderedTestModel.get_by_id(ordered[2])
+    assert pages == ordered
+    assert backwards == ordered[:-1]
+    assert middle.rank() == 2
+    assert middle.next_element.id == ordered[3]
+    assert middle.previous_element.id == ordered[1]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=3)
+def test_neighbours_and_rank(obj0, obj1, obj2):
+    obj2.sort(after=obj0)
+    obj0, obj1, obj2 = refresh_objects(OrderedTestModel, [obj0, obj1, obj2])
+
+    assert obj2.next_element.id == obj1.id
+    assert obj2.previous_element.id == obj0.id
+    assert obj0.previous_element is None
+    assert obj1.next_element is None
+    assert [obj.rank() for obj in (obj0, obj1, obj2)] == [0, 2, 1]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=3)
+def test_item_at(obj0, obj1, obj2):
+    assert OrderedTestModel.item_at(1).id == obj1.id
+    assert OrderedTestModel.item_at(-1).id == obj2.id
+    assert OrderedTestModel.item_at(-3).id == obj0.id
+    assert OrderedTestModel.item_at(3) is None
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        obj1.rank()
+        obj1.next_element
+
+    assert execute_sql.call_count == 2
+
+
+@use_test_database(models=(ScopedOrderedTestModel,))
+def test_scoped_navigation():
+    objs_a = [ScopedOrderedTestModel.create(tenant='a') for _ in range(3)]
+    objs_b = [ScopedOrderedTestModel.create(tenant='b') for _ in range(2)]
+
+    page, _ = ScopedOrderedTestModel.page_after(scope={'tenant': 'b'})
+    assert [obj.id for obj in page] == [obj.id for obj in objs_b]
+    assert ScopedOrderedTestModel.item_at(2, scope={'tenant': 'a'}).id == objs_a[2].id
+    assert ScopedOrderedTestModel.item_at(2, scope={'tenant': 'b'}) is None
+    assert objs_b[1].rank() == 1
+    assert objs_a[2].next_element is None
+
+
+@pytest.mark.parametrize('moved, target, expected', (
+    (3, {'after': 0}, [10000, 30000, 40000, 20000]),
+    (0, {'after': 2}, [30000, 10000, 20000, 40000]),
+    (3, {'before': 1}, [10000, 30000, 40000, 20000]),
+    (0, {'before': 3}, [30000, 10000, 20000, 40000]),
+    (2, {'after': None}, [20000, 30000, 10000, 40000]),
+    (0, {'after': None}, [10000, 20000, 30000, 40000]),
+))
+@use_test_database(models=(SingleOrderedTestModel,))
+def test_single_statement_sort(moved, target, expected):
+    objs = [SingleOrderedTestModel.create(tenant='a') for _ in range(4)]
+    other = SingleOrderedTestModel.create(tenant='b')
+    target = {key: value if value is None else objs[value] for key, value in target.items()}
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        objs[moved].sort(**target)
+
+    queries = [c.args[0] for c in execute_sql.call_args_list if c.args[0] != 'BEGIN']
+    updates = [query for query in queries if query.startswith('UPDATE')]
+    assert len(updates) == 1
+    assert len(queries) == (2 if target == {'after': None} else 1)
+    assert 'SET "position" = CASE' in updates[0]
+    assert objs[moved].position == expected[moved]
+    assert positions(SingleOrderedTestModel, objs) == expected
+    assert positions(SingleOrderedTestModel, other) == [10000]
+
+
+@use_test_database(models=(SingleOrderedTestModel,))
+def test_single_statement_sort_writes_only_position():
+    obj0, obj1 = (SingleOrderedTestModel.create(name='name') for _ in range(2))
+    obj1.name = 'changed'
+
+    obj1.sort(before=obj0)
+
+    assert refresh_objects(SingleOrderedTestModel, obj1)[0].name == 'name'
+    assert positions(SingleOrderedTestModel, [obj0, obj1]) == [20000, 10000]
+
+    with pytest.raises(ValueError):
+        obj0.sort(before=obj1)
+
+
+@use_test_database(models=(ScopedOrderedTestModel,))
+def test_export_chunks():
+    objs = [ScopedOrderedTestModel.create(tenant='a') for _ in range(5)]
+    ScopedOrderedTestModel.create(tenant='b')
+    objs[4].sort(after=objs[0])
+    objs = refresh_objects(ScopedOrderedTestModel, objs)
+    objs[3].position = objs[2].position
+    objs[3].save()
+
+    chunks = list(ScopedOrderedTestModel.export_chunks(scope={'tenant': 'a'}, chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    exported = [row['id'] for chunk in chunks for row in chunk]
+    assert exported[:3] == [objs[0].id, objs[4].id, objs[1].id]
+    assert sorted(exported[3:]) == sorted([objs[2].id, objs[3].id])
+    assert list(ScopedOrderedTestModel.export_chunks(scope={'tenant': 'c'})) == []
+
+    fields = [ScopedOrderedTestModel.tenant]
+    row = next(ScopedOrderedTestModel.export_chunks(scope={'tenant': 'a'}, fields=fields))[0]
+    assert set(row) == {'id', 'tenant', 'position'}
+
+
+@use_test_database(models=(ScopedOrderedTestModel,))
+def test_import_chunks():
+    objs = [ScopedOrderedTestModel.create(tenant='a') for _ in range(5)]
+    ScopedOrderedTestModel.create(tenant='b')
+    chunks = ScopedOrderedTestModel.export_chunks(scope={'tenant': 'a'}, chunk_size=2)
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        imported = ScopedOrderedTestModel.import_chunks(chunks, overrides={'tenant': 'b'})
+
+    copies = list(ScopedOrderedTestModel.select().where(
+        ScopedOrderedTestModel.tenant == 'b').order_by(ScopedOrderedTestModel.position))
+    inserts = [c for c in execute_sql.call_args_list if c.args[0].startswith('INSERT')]
+    assert imported == 5
+    assert len(inserts) == 3
+    assert [obj.position for obj in copies] == [10000 * index for index in range(1, 7)]
+    assert not {obj.id for obj in copies} & {obj.id for obj in objs}
+
+
+@use_test_database(models=(ScopedOrderedTestModel,))
+def test_import_chunks_into_exported_list():
+    for _ in range(3):
+        ScopedOrderedTestModel.create(tenant='a')
+
+    chunks = ScopedOrderedTestModel.export_chunks(scope={'tenant': 'a'}, chunk_size=1)
+
+    assert ScopedOrderedTestModel.import_chunks(chunks) == 3
+    assert ScopedOrderedTestModel.select().count() == 6
+
+
+@use_test_database(models=(ScopedOrderedTestModel,))
+def test_reorder_other_scopes():
+    objs_a = [ScopedOrderedTestModel.create(tenant='a') for _ in range(2)]
+    objs_b = [ScopedOrderedTestModel.create(tenant='b') for _ in range(2)]
+
+    with pytest.raises(ValueError):
+        ScopedOrderedTestModel.reorder([objs_b[0].id, objs_a[1].id, objs_a[0].id])
+
+    assert ScopedOrderedTestModel.reorder([objs_a[1].id, objs_a[0].id]) == 2
+    assert positions(ScopedOrderedTestModel, objs_a + objs_b) == [20000, 10000, 10000, 20000]
+
+
+@pytest.mark.provide_objects(model=OrderedTestModel, count=3)
+def test_reorder_is_atomic(obj0, obj1, obj2):
+    original = OrderedTestModel.update
+    updates = []
+
+    def failing_update(*args, **kwargs):
+        updates.append(args)
+        if len(updates) > 1:
+            raise peewee.OperationalError('failed')
+        return original(*args, **kwargs)
+
+    with patch.object(OrderedTestModel, 'REORDER_BATCH_SIZE', 1), patch.object(
+        OrderedTestModel, 'update', side_effect=failing_update,
+    ):
+        with pytest.raises(peewee.OperationalError):
+            OrderedTestModel.reorder([obj2.id, obj1.id, obj0.id])
+
+    assert positions(OrderedTestModel, [obj0, obj1, obj2]) == [10000, 20000, 30000]
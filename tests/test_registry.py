@@ -0,0 +1,156 @@
+from unittest.mock import patch
+
+import peewee
+import pytest
+
+from connect.utils.peewee.exceptions import AmbiguousPrefixException
+from connect.utils.peewee.mixins import TransactionalIDMixin, VerboseIDMixin
+from connect.utils.peewee.registry import (
+    PrefixRegistry,
+    default_registry,
+    fetch_many,
+    register_model,
+    resolve_model,
+)
+from tests.utils import db, use_test_database
+
+
+class RegistryModel(VerboseIDMixin):
+    @property
+    def prefix(self):
+        return 'TEST-REG'
+
+    class Meta:
+        database = db
+
+
+class RegistrySubModel(VerboseIDMixin):
+    @property
+    def prefix(self):
+        return 'TEST-REG-SUB'
+
+    class Meta:
+        database = db
+
+
+class RegistryTransactionalModel(TransactionalIDMixin):
+    CHAIN_FIELD = 'parent'
+
+    parent = peewee.ForeignKeyField(RegistryModel)
+
+    @property
+    def prefix(self):
+        return 'TEST-REG-TR'
+
+    class Meta:
+        database = db
+
+
+MODELS = (RegistryModel, RegistrySubModel, RegistryTransactionalModel)
+
+
+def test_registry_resolves_longest_prefix():
+    registry = PrefixRegistry(MODELS)
+
+    assert registry.resolve('TEST-REG-123-456-789') is RegistryModel
+    assert registry.resolve('TEST-REG-SUB-123-456-789') is RegistrySubModel
+    assert registry.resolve('TEST-REG-TR-123-456-789-001') is RegistryTransactionalModel
+    assert registry.resolve('TEST-REGS-123') is None
+    assert registry.resolve('TEST-REG') is None
+
+
+def test_registry_ambiguous_prefix():
+    registry = PrefixRegistry([RegistryModel])
+    registry.register(RegistrySubModel, 'TEST-REG')
+
+    with pytest.raises(AmbiguousPrefixException, match='TEST-REG-'):
+        registry.resolve('TEST-REG-123')
+
+    assert registry.resolve('TEST-OTHER-123') is None
+
+
+def test_registry_group():
+    registry = PrefixRegistry(MODELS)
+
+    assert registry.group(['TEST-REG-1', 'X-1', 'TEST-REG-SUB-1', 'TEST-REG-2']) == {
+        RegistryModel: ['TEST-REG-1', 'TEST-REG-2'],
+        None: ['X-1'],
+        RegistrySubModel: ['TEST-REG-SUB-1'],
+    }
+
+
+@use_test_database(models=MODELS)
+def test_registry_fetch():
+    parent, other = RegistryModel.create(), RegistryModel.create()
+    sub = RegistrySubModel.create()
+    chained = RegistryTransactionalModel.create(parent=parent)
+    ids = [chained.id, other.id, 'TEST-REG-SUB-000-000-000', sub.id, 'UNKNOWN-1', parent.id]
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        objs = PrefixRegistry(MODELS).fetch(ids)
+
+    assert execute_sql.call_count == 3
+    assert [obj and obj.id for obj in objs] == [
+        chained.id, other.id, None, sub.id, None, parent.id,
+    ]
+    assert type(objs[0]) is RegistryTransactionalModel
+
+
+@use_test_database(models=MODELS)
+def test_default_registry():
+    obj = RegistrySubModel.create()
+
+    assert default_registry() is default_registry()
+    assert resolve_model('TEST-REG-TR-123-001') is RegistryTransactionalModel
+    assert fetch_many([obj.id])[0].id == obj.id
+
+
+class RegistryChildModel(RegistryModel):
+    class Meta:
+        database = db
+
+
+class RegistryPrefixlessModel(VerboseIDMixin):
+    @property
+    def prefix(self):
+        return self.parent_prefix
+
+    class Meta:
+        database = db
+
+
+def test_registry_prefers_subclass():
+    registry = PrefixRegistry([RegistryModel, RegistryChildModel])
+
+    assert registry.resolve('TEST-REG-123') is RegistryChildModel
+
+
+def test_registry_prefers_explicit_model():
+    registry = PrefixRegistry()
+    registry.register(RegistryModel, explicit=False)
+    registry.register(RegistrySubModel, 'TEST-REG', explicit=False)
+
+    with pytest.raises(AmbiguousPrefixException):
+        registry.resolve('TEST-REG-123')
+
+    registry.register(RegistrySubModel, 'TEST-REG')
+
+    assert registry.resolve('TEST-REG-123') is RegistrySubModel
+
+
+def test_default_registry_is_cached():
+    registry = default_registry()
+
+    with patch.object(RegistryModel, '__subclasses__') as subclasses:
+        assert default_registry() is registry
+
+    subclasses.assert_not_called()
+    assert resolve_model('TEST-REG-123') is RegistryChildModel
+
+
+def test_default_registry_register_model():
+    assert resolve_model('TEST-PL-123') is None
+
+    register_model(RegistryPrefixlessModel, 'TEST-PL')
+
+    assert resolve_model('TEST-PL-123') is RegistryPrefixlessModel
@@ -1,6 +1,9 @@
+from unittest.mock import patch
+
 import peewee
 import pytest
 
+from connect.utils.peewee.counters import counter_model
 from connect.utils.peewee.exceptions import (
     InvalidVerboseIdException,
     MissedChainFieldException,
@@ -36,6 +39,21 @@ class TransactionalIDModel(TransactionalIDMixin):
         database = db
 
 
+class CounterTransactionalIDModel(TransactionalIDMixin):
+    SUFFIX_LENGTH = 3
+    CHAIN_FIELD = 'vid'
+    CHAIN_ID_COUNTER = True
+
+    vid = peewee.ForeignKeyField(VerboseIDModel, backref='counterTransactionalIDs')
+
+    @property
+    def prefix(self):
+        return 'TEST-CNT-ID'
+
+    class Meta:
+        database = db
+
+
 class TransactionalIDNoSafeModel(TransactionalIDMixin):
     SUFFIX_LENGTH = 3
     CHAIN_FIELD = 'vid'
@@ -64,6 +82,55 @@ class WrongTransactionalIDModel(TransactionalIDMixin):
         database = db
 
 
+class ItemModel(peewee.Model):
+    vid = peewee.ForeignKeyField(VerboseIDModel)
+
+    class Meta:
+        database = db
+
+
+class OrderModel(peewee.Model):
+    item = peewee.ForeignKeyField(ItemModel)
+
+    class Meta:
+        database = db
+
+
+class ItemTransactionalIDModel(TransactionalIDMixin):
+    SUFFIX_LENGTH = 3
+    CHAIN_FIELD = 'item__vid'
+
+    item = peewee.ForeignKeyField(ItemModel)
+
+    @property
+    def prefix(self):
+        return 'TEST-ITEM-ID'
+
+    class Meta:
+        database = db
+
+
+class OrderTransactionalIDModel(TransactionalIDMixin):
+    SUFFIX_LENGTH = 3
+    CHAIN_FIELD = 'order__item__vid'
+
+    order = peewee.ForeignKeyField(OrderModel)
+
+    @property
+    def prefix(self):
+        return 'TEST-ORDER-ID'
+
+    class Meta:
+        database = db
+
+
+def selects_from(execute_sql, model):
+    return [
+        c.args[0] for c in execute_sql.call_args_list
+        if f'FROM "{model._meta.table_name}"' in c.args[0]
+    ]
+
+
 @use_test_database(models=(VerboseIDModel, TransactionalIDModel))
 def test_transactional_id_generation():
     v_id_obj = VerboseIDModel.create()
@@ -105,3 +172,178 @@ def test_invalid_chain_field_property():
 def test_none_chain_field_property_value():
     with pytest.raises(NullFieldValueException):
         TransactionalIDModel.create(vid='None')
+
+
+@use_test_database(models=(VerboseIDModel, TransactionalIDModel))
+def test_transactional_id_bulk_create():
+    v_id_obj = VerboseIDModel.create()
+    prefix = v_id_obj.id.replace('TEST-VERBOSE-ID', 'TEST-TRAN-ID')
+
+    objs = [TransactionalIDModel(vid=v_id_obj) for _ in range(3)]
+    TransactionalIDModel.bulk_create(objs)
+
+    assert [obj.id for obj in objs] == [f'{prefix}-00{_}' for _ in range(1, 4)]
+    assert TransactionalIDModel.select().count() == 3
+
+
+@use_test_database(models=(VerboseIDModel, TransactionalIDModel))
+def test_transactional_id_bulk_create_long_chain():
+    v_id_obj = VerboseIDModel.create()
+    count = TransactionalIDModel.MAX_ID_GENERATION_ITERATIONS + 2
+
+    objs = [TransactionalIDModel(vid=v_id_obj) for _ in range(count)]
+    TransactionalIDModel.bulk_create(objs)
+
+    assert [obj.chain_id for obj in objs] == list(range(1, count + 1))
+
+
+@use_test_database(models=(VerboseIDModel, TransactionalIDModel))
+def test_transactional_id_generation_continues_chain():
+    v_id_obj = VerboseIDModel.create()
+    other_v_id_obj = VerboseIDModel.create()
+    prefix = v_id_obj.id.replace('TEST-VERBOSE-ID', 'TEST-TRAN-ID')
+    TransactionalIDModel.create(vid=v_id_obj, id=f'{prefix}-007', chain_id=7)
+    TransactionalIDModel.create(vid=other_v_id_obj)
+
+    assert TransactionalIDModel.create(vid=v_id_obj).id == f'{prefix}-008'
+
+
+@use_test_database(models=(counter_model(db), VerboseIDModel, CounterTransactionalIDModel))
+def test_transactional_id_generation_with_counter():
+    v_id_obj = VerboseIDModel.create()
+    prefix = v_id_obj.id.replace('TEST-VERBOSE-ID', 'TEST-CNT-ID')
+    CounterTransactionalIDModel.create(vid=v_id_obj, id=f'{prefix}-005', chain_id=5)
+
+    objs = [CounterTransactionalIDModel.create(vid=v_id_obj) for _ in range(3)]
+
+    assert [obj.id for obj in objs] == [f'{prefix}-00{_}' for _ in range(6, 9)]
+    assert counter_model(db).get_by_id(
+        f'countertransactionalidmodel:{prefix}-').value == 8
+
+
+@use_test_database(models=(VerboseIDModel, TransactionalIDModel))
+def test_transactional_id_bulk_create_many_chains():
+    v_id_objs = [VerboseIDModel.create() for _ in range(3)]
+    prefixes = [obj.id.replace('TEST-VERBOSE-ID', 'TEST-TRAN-ID') for obj in v_id_objs]
+    TransactionalIDModel.create(vid=v_id_objs[0])
+    TransactionalIDModel.create(vid=v_id_objs[0])
+
+    objs = [TransactionalIDModel(vid=v_id_obj) for v_id_obj in v_id_objs * 2]
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        TransactionalIDModel.bulk_create(objs)
+
+    assert [obj.id for obj in objs] == [
+        f'{prefixes[0]}-003',
+        f'{prefixes[1]}-001',
+        f'{prefixes[2]}-001',
+        f'{prefixes[0]}-004',
+        f'{prefixes[1]}-002',
+        f'{prefixes[2]}-002',
+    ]
+    assert len([c for c in execute_sql.call_args_list if 'MAX(' in c.args[0]]) == 1
+
+
+@use_test_database(models=(counter_model(db), VerboseIDModel, CounterTransactionalIDModel))
+def test_transactional_id_bulk_create_with_counter():
+    v_id_obj = VerboseIDModel.create()
+    prefix = v_id_obj.id.replace('TEST-VERBOSE-ID', 'TEST-CNT-ID')
+    CounterTransactionalIDModel.create(vid=v_id_obj)
+
+    objs = [CounterTransactionalIDModel(vid=v_id_obj) for _ in range(3)]
+    CounterTransactionalIDModel.bulk_create(objs)
+
+    assert [obj.id for obj in objs] == [f'{prefix}-00{_}' for _ in range(2, 5)]
+    assert CounterTransactionalIDModel.create(vid=v_id_obj).id == f'{prefix}-005'
+
+
+@use_test_database(models=(VerboseIDModel, TransactionalIDModel))
+def test_chain_parent_is_not_loaded():
+    v_id_obj = VerboseIDModel.create()
+    obj = TransactionalIDModel(vid=v_id_obj.id)
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        obj.save()
+
+    assert obj.id == v_id_obj.id.replace('TEST-VERBOSE-ID', 'TEST-TRAN-ID') + '-001'
+    assert not selects_from(execute_sql, VerboseIDModel)
+
+
+@use_test_database(models=(VerboseIDModel, ItemModel, ItemTransactionalIDModel))
+def test_chain_parent_two_hops():
+    v_id_obj = VerboseIDModel.create()
+    item = ItemModel.create(vid=v_id_obj)
+    obj = ItemTransactionalIDModel(item=item.id)
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        obj.save()
+
+    assert obj.id == v_id_obj.id.replace('TEST-VERBOSE-ID', 'TEST-ITEM-ID') + '-001'
+    assert len(selects_from(execute_sql, ItemModel)) == 1
+    assert not selects_from(execute_sql, VerboseIDModel)
+
+
+@use_test_database(models=(VerboseIDModel, ItemModel, OrderModel, OrderTransactionalIDModel))
+def test_chain_parent_three_hops_join():
+    v_id_obj = VerboseIDModel.create()
+    order = OrderModel.create(item=ItemModel.create(vid=v_id_obj))
+    obj = OrderTransactionalIDModel(order=order.id)
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        obj.save()
+
+    queries = selects_from(execute_sql, OrderModel)
+    assert obj.id == v_id_obj.id.replace('TEST-VERBOSE-ID', 'TEST-ORDER-ID') + '-001'
+    assert len(queries) == 1
+    assert 'JOIN "itemmodel"' in queries[0]
+    assert not selects_from(execute_sql, ItemModel)
+
+
+@use_test_database(models=(VerboseIDModel, ItemModel, ItemTransactionalIDModel))
+def test_prefetch_chain_parents_on_bulk_create():
+    v_id_objs = [VerboseIDModel.create() for _ in range(2)]
+    items = [ItemModel.create(vid=v_id_obj) for v_id_obj in v_id_objs]
+    objs = [ItemTransactionalIDModel(item=item.id) for item in items * 2]
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        ItemTransactionalIDModel.bulk_create(objs)
+
+    prefixes = [
+        v_id_obj.id.replace('TEST-VERBOSE-ID', 'TEST-ITEM-ID') for v_id_obj in v_id_objs
+    ]
+    assert [obj.id for obj in objs] == [
+        f'{prefixes[0]}-001', f'{prefixes[1]}-001', f'{prefixes[0]}-002', f'{prefixes[1]}-002',
+    ]
+    assert len(selects_from(execute_sql, ItemModel)) == 1
+
+
+def query_plan(execute_sql, marker):
+    sql, params = next(c.args for c in execute_sql.call_args_list if marker in c.args[0])
+    return ' '.join(row[-1] for row in db.execute_sql(f'EXPLAIN QUERY PLAN {sql}', params))
+
+
+@use_test_database(models=(VerboseIDModel, TransactionalIDModel))
+def test_max_chain_id_uses_primary_key_index():
+    v_id_obj = VerboseIDModel.create()
+    TransactionalIDModel.create(vid=v_id_obj)
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        obj = TransactionalIDModel.create(vid=v_id_obj)
+
+    plan = query_plan(execute_sql, 'MAX(')
+    assert obj.chain_id == 2
+    assert 'SEARCH' in plan and 'INDEX' in plan
+
+
+@use_test_database(models=(VerboseIDModel, TransactionalIDModel))
+def test_max_chain_ids_use_primary_key_index():
+    v_id_objs = [VerboseIDModel.create() for _ in range(2)]
+    TransactionalIDModel.create(vid=v_id_objs[0])
+
+    with patch.object(db, 'execute_sql', wraps=db.execute_sql) as execute_sql:
+        TransactionalIDModel.bulk_create([
+            TransactionalIDModel(vid=v_id_obj) for v_id_obj in v_id_objs * 2
+        ])
+
+    plan = query_plan(execute_sql, 'MAX(')
+    assert sorted(obj.chain_id for obj in TransactionalIDModel.select()) == [1, 1, 2, 2, 3]
+    assert 'SCAN' not in plan
@@ -3,7 +3,9 @@ from unittest.mock import patch
 import peewee
 import pytest
 
+from connect.utils.peewee.exceptions import IDSpaceSaturatedException
 from connect.utils.peewee.mixins import VerboseIDMixin
+from connect.utils.peewee.utils import VerboseIDFormat, recommend_suffix_length, verbose_id_format
 from tests.utils import db, use_test_database
 
 
@@ -70,3 +72,229 @@ def test_id_already_present():
     obj = VerboseIDModel.get(id='TEST-ID')
 
     assert obj
+
+
+@use_test_database(models=(VerboseIDModel,))
+def test_bulk_create_generates_ids():
+    VerboseIDModel.bulk_create([VerboseIDModel(name=f'Test name {i}') for i in range(10)])
+
+    ids = [obj.id for obj in VerboseIDModel.select()]
+
+    assert len(set(ids)) == 10
+    assert all(id_value.startswith('TEST-VERBOSE-ID') for id_value in ids)
+
+
+@use_test_database(models=(VerboseIDModel,))
+@patch.object(
+    VerboseIDFormat,
+    'generate_many',
+    return_value=['TEST-VERBOSE-ID-0001', 'TEST-VERBOSE-ID-0002', 'TEST-VERBOSE-ID-0002'],
+)
+@patch(
+    'connect.utils.peewee.mixins.generate_verbose_id',
+    side_effect=['TEST-VERBOSE-ID-0003', 'TEST-VERBOSE-ID-0004'],
+)
+def test_bulk_create_regenerates_colliding_ids(mock_generate_verbose_id, mock_generate_many):
+    VerboseIDModel.insert(id='TEST-VERBOSE-ID-0001', name='Existing').execute()
+
+    objs = [VerboseIDModel(name=f'Test name {i}') for i in range(3)]
+    VerboseIDModel.bulk_create(objs)
+
+    assert [obj.id for obj in objs] == [
+        'TEST-VERBOSE-ID-0003',
+        'TEST-VERBOSE-ID-0002',
+        'TEST-VERBOSE-ID-0004',
+    ]
+    assert VerboseIDModel.select().count() == 4
+
+
+@use_test_database(models=(VerboseIDModel,))
+@patch.object(
+    VerboseIDFormat,
+    'generate_many',
+    return_value=['TEST-VERBOSE-ID-0001', 'TEST-VERBOSE-ID-0001'],
+)
+@patch('connect.utils.peewee.mixins.generate_verbose_id', return_value='TEST-VERBOSE-ID-0001')
+def test_bulk_create_error_on_duplicate(mock_generate_verbose_id, mock_generate_many):
+    with pytest.raises(Exception, match="Couldn't generate ID."):
+        VerboseIDModel.bulk_create([VerboseIDModel(name='1'), VerboseIDModel(name='2')])
+
+    assert VerboseIDModel.select().count() == 0
+
+
+class OptimisticVerboseIDModel(VerboseIDMixin):
+    OPTIMISTIC_INSERT = True
+
+    @property
+    def prefix(self):
+        return 'TEST-OPTIMISTIC-ID'
+
+    name = peewee.CharField()
+
+    class Meta:
+        database = db
+
+
+@use_test_database(models=(OptimisticVerboseIDModel,))
+@patch(
+    'connect.utils.peewee.mixins.generate_verbose_id',
+    side_effect=['TEST-OPTIMISTIC-ID-0001', 'TEST-OPTIMISTIC-ID-0001', 'TEST-OPTIMISTIC-ID-0002'],
+)
+def test_optimistic_insert_retries_on_conflict(mock_generate_verbose_id):
+    OptimisticVerboseIDModel.create(name='Test name 1')
+
+    with db.atomic():
+        obj = OptimisticVerboseIDModel.create(name='Test name 2')
+
+    assert obj.id == 'TEST-OPTIMISTIC-ID-0002'
+    assert OptimisticVerboseIDModel.select().count() == 2
+
+
+@use_test_database(models=(OptimisticVerboseIDModel,))
+@patch(
+    'connect.utils.peewee.mixins.generate_verbose_id',
+    return_value='TEST-OPTIMISTIC-ID-0001',
+)
+def test_optimistic_insert_error_on_duplicate(mock_generate_verbose_id):
+    OptimisticVerboseIDModel.create(name='Test name 1')
+
+    obj = OptimisticVerboseIDModel(name='Test name 2')
+    with pytest.raises(Exception, match='Cannot generate ID after 5 iterations.'):
+        obj.save()
+
+    assert obj.id is None
+    assert mock_generate_verbose_id.call_count == 6
+
+
+@use_test_database(models=(OptimisticVerboseIDModel,))
+def test_optimistic_insert_integrity_error():
+    with pytest.raises(peewee.IntegrityError):
+        OptimisticVerboseIDModel.create()
+
+
+@pytest.mark.parametrize('message', (
+    'UNIQUE constraint failed: verboseidmodel.id',
+    'duplicate key value violates unique constraint "verboseidmodel_pkey"\n'
+    'DETAIL:  Key (id)=(TEST-VERBOSE-ID-0001) already exists.',
+    "Duplicate entry 'TEST-VERBOSE-ID-0001' for key 'verboseidmodel.PRIMARY'",
+))
+def test_primary_key_conflict_detection(message):
+    error = peewee.IntegrityError(Exception(message))
+
+    assert VerboseIDModel._is_primary_key_conflict(error)
+
+
+def test_primary_key_conflict_detection_other_constraint():
+    error = peewee.IntegrityError(Exception('NOT NULL constraint failed: verboseidmodel.id'))
+
+    assert not VerboseIDModel._is_primary_key_conflict(error)
+
+
+class CustomVerboseIDModel(VerboseIDMixin):
+    sequence = iter(range(10 ** 6))
+
+    @property
+    def prefix(self):
+        return 'TEST-CUSTOM-ID'
+
+    def _generate_id(self, using=None, iteration=0):
+        return self._wrap_sequence(str(next(self.sequence)).zfill(self.SUFFIX_LENGTH))
+
+    class Meta:
+        database = db
+
+
+@use_test_database(models=(CustomVerboseIDModel,))
+def test_bulk_create_uses_overridden_generate_id():
+    CustomVerboseIDModel.sequence = iter(range(10 ** 6))
+    obj = CustomVerboseIDModel.create()
+    CustomVerboseIDModel.bulk_create([CustomVerboseIDModel() for _ in range(2)])
+
+    assert obj.id == 'TEST-CUSTOM-ID-000-000-000'
+    assert sorted(obj.id for obj in CustomVerboseIDModel.select()) == [
+        'TEST-CUSTOM-ID-000-000-000', 'TEST-CUSTOM-ID-000-000-001', 'TEST-CUSTOM-ID-000-000-002',
+    ]
+
+
+class ShortVerboseIDModel(VerboseIDMixin):
+    SUFFIX_LENGTH = 2
+
+    @property
+    def prefix(self):
+        return 'TEST-SHORT-ID'
+
+    class Meta:
+        database = db
+
+
+def test_id_space_report():
+    report = ShortVerboseIDModel.id_space_report(rows=9)
+
+    assert report.space == 90
+    assert report.collision_probability == pytest.approx(0.1)
+    assert report.expected_retries == pytest.approx(1 / 9)
+    assert report.failure_probability == pytest.approx(1e-10)
+    assert report.recommended_suffix_length == 3
+
+    report = ShortVerboseIDModel.id_space_report(rows=9, target_rows=10 ** 6)
+    assert report.recommended_suffix_length == 9
+
+
+@use_test_database(models=(ShortVerboseIDModel,))
+def test_id_space_report_counts_rows():
+    ShortVerboseIDModel.bulk_create([ShortVerboseIDModel() for _ in range(3)])
+    ShortVerboseIDModel.create(id='TEST-OTHER-ID-11')
+
+    assert ShortVerboseIDModel.id_space_report().rows == 4
+    assert ShortVerboseIDModel.id_space_report(prefix='TEST-SHORT-ID').rows == 3
+
+
+def test_id_space_report_full_space():
+    report = ShortVerboseIDModel.id_space_report(rows=90)
+
+    assert report.collision_probability == 1
+    assert report.expected_retries == float('inf')
+
+
+def test_check_id_space_warns(caplog):
+    ShortVerboseIDModel.check_id_space(rows=0)
+    assert not caplog.records
+
+    report = ShortVerboseIDModel.check_id_space(rows=45)
+
+    assert report.collision_probability == 0.5
+    assert 'recommended SUFFIX_LENGTH: 4' in caplog.text
+
+
+def test_check_id_space_fail_fast():
+    with patch.object(ShortVerboseIDModel, 'ID_SPACE_FAIL_FAST', True):
+        with pytest.raises(IDSpaceSaturatedException, match='collision probability is 50.00%'):
+            ShortVerboseIDModel.check_id_space(rows=45)
+
+
+def test_recommend_suffix_length_invalid_probability():
+    with pytest.raises(ValueError):
+        recommend_suffix_length(10, 0)
+
+
+def test_verbose_id_format():
+    id_format = verbose_id_format('PRD', 10, 4, '-')
+
+    assert id_format is verbose_id_format('PRD', 10, 4, '-')
+    assert id_format.render('1234567890') == 'PRD-1234-5678-90'
+    assert id_format.render('123456789012') == 'PRD-1234-5678-9012'
+    assert id_format.is_valid('PRD-1234-5678-90')
+    assert not id_format.is_valid('PRD-1234-567890')
+    assert id_format.base_id('PRD-1234-5678-90') == '1234-5678-90'
+    assert id_format.base_id('PR-1234-5678-90') is None
+
+
+def test_verbose_id_format_generate_many():
+    id_format = verbose_id_format('PRD', 12, None, '-')
+
+    ids = id_format.generate_many(100)
+
+    assert len(ids) == 100
+    assert all(id_format.is_valid(id_value) for id_value in ids)
+    assert id_format.generate_many(0) == []
+    assert verbose_id_format('PRD', 0, None, '-').generate_many(2) == ['PRD-', 'PRD-']